@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import sys
 import pandas as pd
 import numpy as np
 import tkinter as tk
@@ -10,166 +11,55 @@ from sklearn.ensemble import RandomForestClassifier, IsolationForest
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from recording_store import read_recording
+from utils import META_COLUMNS, load_scenario, select_component
+
 #####################################
 # Data Processing Functions
 #####################################
 
-def extract_features(df, window_size=100, step=50):
-    """
-    Extracts features from a DataFrame using a sliding window.
-    Computes mean, standard deviation, min, and max for each numeric column.
-    """
-    features = []
-    for start in range(0, len(df) - window_size + 1, step):
-        window = df.iloc[start:start+window_size]
-        feat = {}
-        for col in df.columns:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                feat[col + '_mean'] = window[col].mean()
-                feat[col + '_std'] = window[col].std()
-                feat[col + '_min'] = window[col].min()
-                feat[col + '_max'] = window[col].max()
-        features.append(feat)
-    return pd.DataFrame(features)
-
-def load_and_process_file(filepath, label, window_size=100, step=50):
-    """
-    Loads a CSV file, renames columns based on the file name for better clarity,
-    extracts numeric features, and attaches a label.
-    """
-    try:
-        df = pd.read_csv(filepath)
-    except Exception as e:
-        print(f"Error reading {filepath}: {e}")
-        return None
-
-    # Determine a renaming map based on the file name
-    lower_filepath = filepath.lower()
-    rename_map = {}
-    if "driver" in lower_filepath:
-        # For engines: measured parameter is Driver Power (kW)
-        rename_map = {'0': 'DriverPower'}
-    elif "phydraulique" in lower_filepath:
-        # For hydraulic pumps: measured parameter is Pump Motor Speed (RPM)
-        rename_map = {'0': 'PumpMotorSpeed'}
-    elif "pump" in lower_filepath and "phydraulique" not in lower_filepath:
-        # For pumps: measured parameter is Pump Flow (L/min)
-        rename_map = {'0': 'PumpFlow'}
-    elif "tank" in lower_filepath:
-        # For tanks: measured parameters are Tank Volume and Tank Temperature
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        if len(numeric_cols) >= 2:
-            rename_map = {'0': 'TankVolume', '1': 'TankTemperature'}
-        else:
-            rename_map = {'0': 'TankMeasurement'}
-
-    if rename_map:
-        df.rename(columns=rename_map, inplace=True)
-
-    # Select numeric columns
-    numeric_df = df.select_dtypes(include=[np.number])
-    if numeric_df.empty:
-        print(f"No numeric columns found in {filepath}.")
-        return None
-
-    feature_df = extract_features(numeric_df, window_size, step)
-    feature_df['label'] = label
-    feature_df['source'] = os.path.basename(filepath)
-    return feature_df
-
-def load_scenario_data(files, window_size=100, step=50):
-    """
-    Processes multiple files given as (filename, label) tuples.
-    """
-    data_list = []
-    for file, label in files:
-        if os.path.exists(file):
-            df = load_and_process_file(file, label, window_size, step)
-            if df is not None:
-                data_list.append(df)
-        else:
-            print(f"File {file} not found.")
-    if data_list:
-        return pd.concat(data_list, ignore_index=True)
-    else:
-        return None
+# Recordings are looked up relative to the working directory, as in
+# show_time_series. Windowing goes through the shared utils pipeline, so the
+# Tkinter sessions reuse the on-disk feature cache and get the categorical
+# `component` column that select_component indexes.
+DATA_DIR = "."
+
+def _dummy_data(labels, source):
+    return pd.DataFrame({
+        'sensor_mean': np.random.rand(50),
+        'sensor_std': np.random.rand(50),
+        'sensor_min': np.random.rand(50),
+        'sensor_max': np.random.rand(50),
+        'label': labels,
+        'source': [source]*50
+    })
 
 def load_scenario1_data(window_size=100, step=50):
-    files = [
-        ("Healthy_Scenario_Driver.csv", 0),
-        ("Healthy_Scenario_Tank.csv", 0),
-        ("Healthy_Scenario1_Driver.csv", 0),
-        ("Healthy_Scenario1_Tank.csv", 0),
-        ("Healthy_Scenario1_Phydraulique.csv", 0),
-        ("Fault_Type2_Driver.csv", 1),
-        ("Fault_Type2_Tank.csv", 1),
-        ("Fault_Type2_Phydraulique.csv", 1)
-    ]
-    data = load_scenario_data(files, window_size, step)
+    data = load_scenario("Scenario 1", window_size=window_size, step=step, data_dir=DATA_DIR)
     if data is None:
         print("No Scenario 1 data found. Generating dummy data.")
-        dummy = pd.DataFrame({
-            'sensor_mean': np.random.rand(50),
-            'sensor_std': np.random.rand(50),
-            'sensor_min': np.random.rand(50),
-            'sensor_max': np.random.rand(50),
-            'label': np.zeros(50, dtype=int),
-            'source': ['dummy_driver']*50
-        })
-        data = dummy
+        data = _dummy_data(np.zeros(50, dtype=int), 'dummy_driver')
     return data
 
 def load_scenario2_data(window_size=100, step=50):
-    files = [
-        ("Healthy_Scenario2_Driver.csv", 0),
-        ("Healthy_Scenario2_Phydraulique.csv", 0),
-        ("Healthy_Scenario2_Pump.csv", 0),
-        ("Healthy_Scenario2_Tank.csv", 0),
-        ("Fault_Type3_Driver.csv", 1),
-        ("Fault_Type3_Phydraulique.csv", 1),
-        ("Fault_Type3_Pump.csv", 1),
-        ("Fault_Type3_Tank.csv", 1)
-    ]
-    data = load_scenario_data(files, window_size, step)
+    data = load_scenario("Scenario 2", window_size=window_size, step=step, data_dir=DATA_DIR)
     if data is None:
         print("No Scenario 2 data found. Generating dummy data.")
-        dummy = pd.DataFrame({
-            'sensor_mean': np.random.rand(50),
-            'sensor_std': np.random.rand(50),
-            'sensor_min': np.random.rand(50),
-            'sensor_max': np.random.rand(50),
-            'label': np.ones(50, dtype=int),
-            'source': ['dummy_pump']*50
-        })
-        data = dummy
+        data = _dummy_data(np.ones(50, dtype=int), 'dummy_pump')
     return data
 
 def load_scenario3_data(window_size=100, step=50):
-    files = [
-        ("Healthy_Scenario3_Driver.csv", 0),
-        ("Healthy_Scenario3_Phydraulique.csv", 0),
-        ("Healthy_Scenario3_Pump.csv", 0),
-        ("Healthy_Scenario3_Tank.csv", 0),
-        ("Fault_Type3+4_Driver.csv", 1),
-        ("Fault_Type3+4_Phydraulique.csv", 1),
-        ("Fault_Type3+4_Tank.csv", 1)
-    ]
-    data = load_scenario_data(files, window_size, step)
+    data = load_scenario("Scenario 3", window_size=window_size, step=step, data_dir=DATA_DIR)
     if data is None:
         print("No Scenario 3 data found. Generating dummy data.")
-        dummy = pd.DataFrame({
-            'sensor_mean': np.random.rand(50),
-            'sensor_std': np.random.rand(50),
-            'sensor_min': np.random.rand(50),
-            'sensor_max': np.random.rand(50),
-            'label': np.concatenate((np.zeros(30, dtype=int), np.ones(20, dtype=int))),
-            'source': ['dummy_tank']*50
-        })
-        data = dummy
+        data = _dummy_data(np.concatenate((np.zeros(30, dtype=int), np.ones(20, dtype=int))), 'dummy_tank')
     return data
 
 def perform_predictive_analysis(data):
-    X = data.drop(columns=['label', 'source'])
+    X = data.drop(columns=META_COLUMNS, errors='ignore')
     y = data['label']
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
     clf = RandomForestClassifier(n_estimators=100, random_state=42)
@@ -251,18 +141,9 @@ class DigitalTwinUI(tk.Tk):
             messagebox.showerror("Error", "No data loaded. Please check your CSV files.")
             return
 
-        # Filter data based on system component
+        # Filter data based on system component (precomputed row-range lookup)
         comp_lower = component.lower()
-        if comp_lower == "hydraulic pump":
-            filtered_data = data[data['source'].str.lower().str.contains("phydraulique")]
-        elif comp_lower == "tanks":
-            filtered_data = data[data['source'].str.lower().str.contains("tank")]
-        elif comp_lower == "engines":
-            filtered_data = data[data['source'].str.lower().str.contains("driver")]
-        elif comp_lower == "pumps":
-            filtered_data = data[data['source'].str.lower().str.contains("pump") & ~data['source'].str.lower().str.contains("phydraulique")]
-        else:
-            filtered_data = data
+        filtered_data = select_component(data, component)
 
         if filtered_data.empty:
             self.output_text.insert(tk.END, "No data found for the selected system component.\n")
@@ -352,7 +233,7 @@ class DigitalTwinUI(tk.Tk):
             return
         file_to_plot = file_candidates[0]
         try:
-            df = pd.read_csv(file_to_plot)
+            df = read_recording(file_to_plot)
         except Exception as e:
             messagebox.showerror("Error", f"Error reading file: {file_to_plot}\n{e}")
             return
@@ -403,18 +284,8 @@ class DigitalTwinUI(tk.Tk):
         if data is None or data.empty:
             messagebox.showerror("Error", "No data loaded for correlation analysis.")
             return
-        # Filter data based on system component
-        if component == "hydraulic pump":
-            filtered_data = data[data['source'].str.lower().str.contains("phydraulique")]
-        elif component == "tanks":
-            filtered_data = data[data['source'].str.lower().str.contains("tank")]
-        elif component == "engines":
-            filtered_data = data[data['source'].str.lower().str.contains("driver")]
-        elif component == "pumps":
-            filtered_data = data[data['source'].str.lower().str.contains("pump") &
-                                 ~data['source'].str.lower().str.contains("phydraulique")]
-        else:
-            filtered_data = data
+        # Filter data based on system component (precomputed row-range lookup)
+        filtered_data = select_component(data, component)
         if filtered_data.empty:
             messagebox.showerror("Error", "No filtered data for correlation analysis.")
             return
@@ -487,23 +358,13 @@ class DigitalTwinUI(tk.Tk):
         if data is None or data.empty:
             messagebox.showerror("Error", "No data loaded for anomaly detection.")
             return
-        if component == "hydraulic pump":
-            filtered_data = data[data['source'].str.lower().str.contains("phydraulique")]
-        elif component == "tanks":
-            filtered_data = data[data['source'].str.lower().str.contains("tank")]
-        elif component == "engines":
-            filtered_data = data[data['source'].str.lower().str.contains("driver")]
-        elif component == "pumps":
-            filtered_data = data[data['source'].str.lower().str.contains("pump") &
-                                 ~data['source'].str.lower().str.contains("phydraulique")]
-        else:
-            filtered_data = data
+        filtered_data = select_component(data, component)
         if filtered_data.empty:
             messagebox.showerror("Error", "No filtered data for anomaly detection.")
             return
 
         filtered_data = filtered_data.copy()  # Avoid SettingWithCopyWarning
-        X = filtered_data.drop(columns=['label', 'source'])
+        X = filtered_data.drop(columns=META_COLUMNS, errors='ignore')
         iso_forest = IsolationForest(contamination=0.1, random_state=42)
         preds = iso_forest.fit_predict(X)
         filtered_data['anomaly'] = preds
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+import h5py
+import numpy as np
+import pandas as pd
+
+from cmaps_loader import _read_rows, aligned_chunk_rows, unit_ranges
+from utils import DEFAULT_FEATURES, _window_stats, _window_view
+
+# Window features over CMAPSS sensor arrays, computed by a process pool
+# without shipping the arrays to the workers: X is read once into a shared
+# memory block, every worker maps it and the shared output buffer, and each
+# task fills the output rows of a disjoint range of engine units in place.
+
+_shared = {}
+
+def _init_worker(x_spec, out_spec):
+    for key, (name, shape, dtype) in (('x', x_spec), ('out', out_spec)):
+        # Pool children report to the parent's resource tracker, so attaching
+        # here does not hand ownership away; the parent unlinks every block
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+def _fill_units(tasks, window_size, step, features):
+    # tasks: [(row start, row stop, output offset)] for consecutive units
+    X = _shared['x'][1]
+    out = _shared['out'][1]
+    for start, stop, offset in tasks:
+        windows = _window_view(X[start:stop], window_size, step)
+        stats = _window_stats(windows.astype(np.float64, copy=False), features, False)
+        block = np.stack([stats[name] for name in stats], axis=2)
+        # (windows, cols, stats) -> column-major feature order, as extract_features
+        out[offset:offset + len(windows)] = block.reshape(len(windows), -1)
+    return len(tasks)
+
+def _stat_names(window_size, n_cols, features):
+    return list(_window_stats(np.zeros((1, n_cols, window_size)), features, False))
+
+def _plan(ranges, window_size, step):
+    # Windows never cross units; returns per-unit (start, stop, offset) with
+    # output offsets laid out unit after unit, and the total window count
+    plan = []
+    total = 0
+    for unit, start, stop in ranges:
+        n_windows = (stop - start - window_size) // step + 1 if stop - start >= window_size else 0
+        if n_windows > 0:
+            plan.append((unit, start, stop, total, n_windows))
+            total += n_windows
+    return plan, total
+
+def _split(plan, parts):
+    # Consecutive units grouped into `parts` tasks of roughly equal row count
+    if not plan:
+        return []
+    rows = np.cumsum([stop - start for _, start, stop, _, _ in plan])
+    cuts = np.searchsorted(rows, np.linspace(0, rows[-1], parts + 1)[1:-1], side='right')
+    groups = np.split(np.arange(len(plan)), cuts)
+    return [[plan[i][1:4] for i in group] for group in groups if len(group)]
+
+def _load_shared(filepath, columns, shm_list):
+    with h5py.File(filepath, 'r') as f:
+        X = f['X']
+        cols = list(range(X.shape[1])) if columns is None else list(columns)
+        shape = (X.shape[0], len(cols))
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * X.dtype.itemsize))
+        shm_list.append(shm)
+        array = np.ndarray(shape, dtype=X.dtype, buffer=shm.buf)
+        # Chunk-aligned reads straight into the shared block; no staging copy
+        step = aligned_chunk_rows(X)
+        for lo in range(0, shape[0], step):
+            hi = min(lo + step, shape[0])
+            array[lo:hi] = _read_rows(X, lo, hi, None if columns is None else cols)
+        rul = f['Y'][:].reshape(shape[0], -1)[:, 0] if 'Y' in f else None
+    return shm, array, cols, rul
+
+def cmaps_window_features(filepath, window_size=30, step=10, columns=None, features=None, workers=None,
+                          tasks_per_worker=4):
+    # Per-unit sliding-window features of a CMAPSS file's X columns, one row
+    # per window with unit, start row and the RUL at the window's last row.
+    # workers=1 computes in this process over the same shared arrays.
+    features = tuple(features) if features else DEFAULT_FEATURES
+    workers = workers or os.cpu_count() or 1
+    shm_list = []
+    try:
+        shm, X, cols, rul = _load_shared(filepath, columns, shm_list)
+        plan, total = _plan(unit_ranges(filepath), window_size, step)
+        stat_names = _stat_names(window_size, len(cols), features)
+        out_shape = (total, len(cols) * len(stat_names))
+        out_shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(out_shape)) * 8))
+        shm_list.append(out_shm)
+        out = np.ndarray(out_shape, dtype=np.float64, buffer=out_shm.buf)
+
+        x_spec = (shm.name, X.shape, X.dtype)
+        out_spec = (out_shm.name, out_shape, np.float64)
+        tasks = _split(plan, workers * tasks_per_worker)
+        if workers == 1 or len(tasks) <= 1:
+            _shared['x'] = (shm, X)
+            _shared['out'] = (out_shm, out)
+            try:
+                for task in tasks:
+                    _fill_units(task, window_size, step, features)
+            finally:
+                _shared.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(x_spec, out_spec)) as pool:
+                list(pool.map(partial(_fill_units, window_size=window_size, step=step, features=features), tasks))
+
+        result = pd.DataFrame(out.copy(), columns=[f"{col}_{name}" for col in cols for name in stat_names])
+        units = np.concatenate([np.full(n, unit) for unit, _, _, _, n in plan]) if plan else []
+        starts = np.concatenate([start + np.arange(n) * step for _, start, _, _, n in plan]) if plan else []
+        result.insert(0, 'start_row', np.asarray(starts, dtype=np.int64))
+        result.insert(0, 'unit', np.asarray(units, dtype=np.int64))
+        if rul is not None and total:
+            result['RUL'] = rul[result['start_row'].to_numpy() + window_size - 1]
+        return result
+    finally:
+        for block in shm_list:
+            block.close()
+            block.unlink()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Window features over CMAPSS files with shared-memory workers.")
+    parser.add_argument("paths", nargs="+", help=".h5 files")
+    parser.add_argument("--window-size", type=int, default=30)
+    parser.add_argument("--step", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        started = time.perf_counter()
+        df = cmaps_window_features(path, args.window_size, args.step, workers=args.workers)
+        print(f"✅ {path}: {len(df)} windows x {df.shape[1]} columns in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,336 @@
 import os
+import json
+import time
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import h5py
+import numpy as np
 import pandas as pd
 
-def load_cmaps_data(filepath):
+from feature_cache import atomic_write_json
+
+# Rows read per step when a dataset is stored contiguously; chunked datasets
+# are read in whole multiples of their own HDF5 chunk height instead.
+DEFAULT_CHUNK_ROWS = 65536
+
+def _read_rows(dset, start, stop, columns):
+    if columns is None:
+        return dset[start:stop]
+    # h5py selections need increasing indices; read sorted, then restore the
+    # caller's order
+    order = np.argsort(columns)
+    sorted_cols = [int(columns[i]) for i in order]
+    block = dset[start:stop, sorted_cols]
+    return block[:, np.argsort(order)]
+
+def aligned_chunk_rows(dset, target_rows=DEFAULT_CHUNK_ROWS):
+    if dset.chunks is None:
+        return target_rows
+    chunk_height = dset.chunks[0]
+    return max(1, target_rows // chunk_height) * chunk_height
+
+def iter_cmaps_chunks(filepath, columns=None, settings=False, rul=True, chunk_rows=DEFAULT_CHUNK_ROWS,
+                      start=0, stop=None):
+    # Lazily yields DataFrames of consecutive rows. Only the X columns listed
+    # in `columns` are read (default: all); `settings` adds W columns (True for
+    # all, or a list of indices) as W0, W1, ...; `rul` adds Y as 'RUL'. Source
+    # dtypes are kept and each read covers whole HDF5 chunks of X.
+    with h5py.File(filepath, 'r') as f:
+        X = f['X']
+        W = f['W'] if settings is not False and 'W' in f else None
+        Y = f['Y'] if rul and 'Y' in f else None
+        x_cols = list(range(X.shape[1])) if columns is None else list(columns)
+        w_cols = None if W is None or settings is True else list(settings)
+        w_names = [f"W{c}" for c in (range(W.shape[1]) if w_cols is None else w_cols)] if W is not None else []
+
+        stop = X.shape[0] if stop is None else min(stop, X.shape[0])
+        step = aligned_chunk_rows(X, chunk_rows)
+        # Start on a chunk boundary so no HDF5 chunk is decompressed twice
+        boundary = (start // step) * step
+        for chunk_start in range(boundary, stop, step):
+            lo = max(chunk_start, start)
+            hi = min(chunk_start + step, stop)
+            if lo >= hi:
+                continue
+            data = {}
+            block = _read_rows(X, lo, hi, None if columns is None else x_cols)
+            for i, col in enumerate(x_cols):
+                data[col] = block[:, i]
+            if W is not None:
+                w_block = _read_rows(W, lo, hi, w_cols)
+                for i, name in enumerate(w_names):
+                    data[name] = w_block[:, i]
+            if Y is not None:
+                data['RUL'] = Y[lo:hi].reshape(hi - lo, -1)[:, 0]
+            yield pd.DataFrame(data, index=pd.RangeIndex(lo, hi))
+
+def load_cmaps_data(filepath, columns=None, settings=False, rul=True, chunk_rows=DEFAULT_CHUNK_ROWS):
     print(f"Loading: {filepath}")
+    # Assume sensor data is in 'X', operational settings in 'W', RUL in 'Y'
+    chunks = list(iter_cmaps_chunks(filepath, columns, settings, rul, chunk_rows))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+def estimate_cmaps_bytes(filepath, columns=None, settings=False, rul=True):
+    # In-memory size of what load_cmaps_data would return, from dataset
+    # shapes and dtypes alone (no data is read)
     with h5py.File(filepath, 'r') as f:
-        # Assume sensor data is in 'X', operational settings in 'W', RUL in 'Y'
-        X = f['X'][:]
-        W = f['W'][:]
-        Y = f['Y'][:] if 'Y' in f else None
+        X = f['X']
+        total = X.shape[0] * (X.shape[1] if columns is None else len(columns)) * X.dtype.itemsize
+        if settings is not False and 'W' in f:
+            W = f['W']
+            total += W.shape[0] * (W.shape[1] if settings is True else len(settings)) * W.dtype.itemsize
+        if rul and 'Y' in f:
+            total += f['Y'].shape[0] * f['Y'].dtype.itemsize
+    return total
+
+def _timed_load(filepath, columns, settings, rul):
+    started = time.perf_counter()
+    df = load_cmaps_data(filepath, columns, settings, rul)
+    return df, time.perf_counter() - started
 
-        df = pd.DataFrame(X)
-        if Y is not None:
-            df['RUL'] = Y
-        return df
+def load_all_cmaps_files(folder, workers=None, memory_budget=None, columns=None, settings=False, rul=True,
+                         return_report=False):
+    # Files are read in a bounded process pool (workers=1 reads them in this
+    # process). With memory_budget (bytes) set, files are scheduled in name
+    # order until the estimated resident size of everything loaded would
+    # exceed it; the rest are skipped. The report holds per-file status,
+    # timing and errors.
+    fnames = sorted(fname for fname in os.listdir(folder) if fname.endswith('.h5'))
+    report = {}
+    scheduled = []
+    resident = 0
+    for fname in fnames:
+        full_path = os.path.join(folder, fname)
+        try:
+            size = estimate_cmaps_bytes(full_path, columns, settings, rul)
+        except Exception as e:
+            print(f"❌ Failed to load {fname}: {e}")
+            report[fname] = {'status': 'failed', 'error': str(e)}
+            continue
+        if memory_budget is not None and resident + size > memory_budget:
+            print(f"⏭️ Memory budget of {memory_budget / 1e6:.1f} MB reached; not loading {fname} "
+                  f"or later files")
+            for skipped in fnames[fnames.index(fname):]:
+                report.setdefault(skipped, {'status': 'skipped', 'bytes': None})
+            report[fname]['bytes'] = size
+            break
+        resident += size
+        scheduled.append((fname, full_path))
+        report[fname] = {'status': 'scheduled', 'bytes': size}
 
-def load_all_cmaps_files(folder):
     data = {}
-    for fname in os.listdir(folder):
-        if fname.endswith('.h5'):
-            full_path = os.path.join(folder, fname)
+
+    def record(fname, df, seconds):
+        data[fname] = df
+        report[fname].update(status='loaded', seconds=seconds, rows=len(df))
+        print(f"✅ {fname}: {len(df)} rows in {seconds:.2f}s")
+
+    def fail(fname, e):
+        print(f"❌ Failed to load {fname}: {e}")
+        report[fname].update(status='failed', error=str(e))
+
+    if workers == 1 or len(scheduled) <= 1:
+        for fname, full_path in scheduled:
             try:
-                df = load_cmaps_data(full_path)
-                data[fname] = df
+                record(fname, *_timed_load(full_path, columns, settings, rul))
             except Exception as e:
-                print(f"❌ Failed to load {fname}: {e}")
-    return data
+                fail(fname, e)
+    else:
+        workers = workers or min(4, os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=min(workers, len(scheduled))) as pool:
+            futures = {pool.submit(_timed_load, full_path, columns, settings, rul): fname
+                       for fname, full_path in scheduled}
+            for future in as_completed(futures):
+                try:
+                    record(futures[future], *future.result())
+                except Exception as e:
+                    fail(futures[future], e)
+        # Keep the folder's name order whatever order the files finished in
+        data = {fname: data[fname] for fname, _ in scheduled if fname in data}
+    return (data, report) if return_report else data
+
+# Sidecar index next to each .h5 file (DS01.h5 -> DS01.index.json) holding
+# the row range of every engine unit and of every cycle within it, read from
+# the first two columns of 'A'. Like the binary recording store, it is
+# rebuilt when the source's size or mtime changes.
+INDEX_SUFFIX = ".index.json"
+
+def index_path(filepath):
+    return os.path.splitext(filepath)[0] + INDEX_SUFFIX
+
+def _runs(values):
+    breaks = np.flatnonzero(np.diff(values) != 0) + 1
+    return np.r_[0, breaks], np.r_[breaks, len(values)]
+
+def build_cmaps_index(filepath, force=False):
+    if not force:
+        index = load_cmaps_index(filepath, build=False)
+        if index is not None:
+            return index
+    with h5py.File(filepath, 'r') as f:
+        n_rows = f['X'].shape[0]
+        if 'A' in f:
+            A = f['A']
+            step = aligned_chunk_rows(A)
+            cols = [0, 1] if A.shape[1] > 1 else [0]
+            aux = np.concatenate([_read_rows(A, lo, min(lo + step, n_rows), cols)
+                                  for lo in range(0, n_rows, step)])
+            unit_col = aux[:, 0]
+            cycle_col = aux[:, 1] if aux.shape[1] > 1 else np.zeros(n_rows)
+        else:
+            unit_col = cycle_col = np.zeros(n_rows)
+
+    units = []
+    if n_rows:
+        # A new cycle starts wherever either the unit or the cycle changes
+        cycle_starts, cycle_stops = _runs(unit_col * (cycle_col.max() + 1) + cycle_col)
+        unit_starts, unit_stops = _runs(unit_col)
+        for lo, hi in zip(unit_starts, unit_stops):
+            inside = (cycle_starts >= lo) & (cycle_starts < hi)
+            units.append({
+                'unit': int(unit_col[lo]),
+                'start': int(lo),
+                'stop': int(hi),
+                'cycles': [[int(cycle_col[c_lo]), int(c_lo), int(c_hi)]
+                           for c_lo, c_hi in zip(cycle_starts[inside], cycle_stops[inside])],
+            })
+    st = os.stat(filepath)
+    index = {'rows': int(n_rows), 'units': units, 'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+    path = index_path(filepath)
+    atomic_write_json(path, index)
+    return index
+
+def load_cmaps_index(filepath, build=True):
+    try:
+        with open(index_path(filepath)) as f:
+            index = json.load(f)
+        st = os.stat(filepath)
+        if index.get('source_size') == st.st_size and index.get('source_mtime_ns') == st.st_mtime_ns:
+            return index
+    except (FileNotFoundError, ValueError):
+        pass
+    return build_cmaps_index(filepath, force=True) if build else None
+
+def unit_ranges(filepath):
+    # (unit, start, stop) row ranges of each engine unit. Files without 'A'
+    # are treated as a single unit.
+    return [(u['unit'], u['start'], u['stop']) for u in load_cmaps_index(filepath)['units']]
+
+def _unit_entry(index, unit):
+    return next((entry for entry in index['units'] if entry['unit'] == unit), None)
+
+def unit_row_range(filepath, unit, cycles=None, index=None):
+    # Row range of one unit, optionally narrowed to an inclusive cycle range
+    entry = _unit_entry(index or load_cmaps_index(filepath), unit)
+    if entry is None:
+        return None
+    if cycles is None:
+        return entry['start'], entry['stop']
+    first, last = cycles
+    selected = [(lo, hi) for cycle, lo, hi in entry['cycles'] if first <= cycle <= last]
+    if not selected:
+        return None
+    return selected[0][0], selected[-1][1]
+
+def read_unit(filepath, unit, cycles=None, columns=None, settings=False, rul=True):
+    # One unit (and cycle range) of a file via the sidecar index, reading only
+    # those rows. Adds 'unit' and 'cycle' columns.
+    index = load_cmaps_index(filepath)
+    row_range = unit_row_range(filepath, unit, cycles, index)
+    if row_range is None:
+        return pd.DataFrame()
+    start, stop = row_range
+    df = pd.concat(list(iter_cmaps_chunks(filepath, columns, settings, rul, start=start, stop=stop)))
+    cycle = np.empty(stop - start, dtype=np.int32)
+    for c, lo, hi in _unit_entry(index, unit)['cycles']:
+        if hi > start and lo < stop:
+            cycle[max(lo, start) - start:min(hi, stop) - start] = c
+    df.insert(0, 'cycle', cycle)
+    df.insert(0, 'unit', unit)
+    return df
+
+def _sequence_starts(ranges, lo, hi, seq_len, stride):
+    # Start rows in [lo, hi) of every full sequence that stays inside one unit
+    starts = []
+    for _, unit_start, unit_stop in ranges:
+        last = unit_stop - seq_len
+        if unit_stop <= lo or unit_start >= hi or last < unit_start:
+            continue
+        first = unit_start + max(0, -(-(lo - unit_start) // stride)) * stride
+        starts.append(np.arange(first, min(last, hi - 1) + 1, stride))
+    return np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+def count_rul_sequences(files, seq_len=50, stride=1):
+    files = [files] if isinstance(files, str) else files
+    return sum(max(0, (stop - start - seq_len) // stride + 1)
+               for file in files for _, start, stop in unit_ranges(file))
+
+def iter_rul_batches(files, seq_len=50, batch_size=256, columns=None, stride=1, shuffle=True, seed=None,
+                     buffer_blocks=4, chunk_rows=DEFAULT_CHUNK_ROWS, drop_last=False):
+    # Streams (X, y) mini-batches of fixed-length sensor sequences, shaped
+    # (batch, seq_len, n_columns), labelled with the RUL at each sequence's
+    # last cycle. Sequences never cross engine units. Rows are read in blocks
+    # aligned to X's HDF5 chunks: an epoch visits the blocks in shuffled order,
+    # `buffer_blocks` at a time, and shuffles the sequences within that buffer,
+    # so only the chunks behind the current batches are ever in memory.
+    files = [files] if isinstance(files, str) else files
+    rng = np.random.default_rng(seed)
+    with ExitStack() as stack:
+        handles = [stack.enter_context(h5py.File(file, 'r')) for file in files]
+        ranges = [unit_ranges(file) for file in files]
+        blocks = []
+        for fi, f in enumerate(handles):
+            n_rows = f['X'].shape[0]
+            step = aligned_chunk_rows(f['X'], chunk_rows)
+            blocks.extend((fi, lo, min(lo + step, n_rows)) for lo in range(0, n_rows, step))
+        order = rng.permutation(len(blocks)) if shuffle else np.arange(len(blocks))
+
+        carry_X = carry_y = None
+        for g in range(0, len(order), buffer_blocks):
+            windows, labels, piece_ids, local_starts = [], [], [], []
+            for fi, lo, hi in (blocks[i] for i in order[g:g + buffer_blocks]):
+                starts = _sequence_starts(ranges[fi], lo, hi, seq_len, stride)
+                if not len(starts):
+                    continue
+                # A sequence starting in this block may run into the next one
+                read_hi = min(int(starts[-1]) + seq_len, handles[fi]['X'].shape[0])
+                X_rows = _read_rows(handles[fi]['X'], lo, read_hi, columns)
+                y_rows = handles[fi]['Y'][lo:read_hi].reshape(read_hi - lo, -1)[:, 0]
+                windows.append(np.lib.stride_tricks.sliding_window_view(X_rows, seq_len, axis=0))
+                labels.append(y_rows[seq_len - 1:])
+                piece_ids.append(np.full(len(starts), len(windows) - 1))
+                local_starts.append(starts - lo)
+            if not windows:
+                continue
+            piece_ids = np.concatenate(piece_ids)
+            local_starts = np.concatenate(local_starts)
+            picks = rng.permutation(len(piece_ids)) if shuffle else np.arange(len(piece_ids))
+
+            for b in range(0, len(picks), batch_size):
+                batch = picks[b:b + batch_size]
+                X_batch = np.empty((len(batch), seq_len, windows[0].shape[1]), dtype=windows[0].dtype)
+                y_batch = np.empty(len(batch), dtype=labels[0].dtype)
+                for piece in np.unique(piece_ids[batch]):
+                    mask = piece_ids[batch] == piece
+                    rows = local_starts[batch[mask]]
+                    X_batch[mask] = windows[piece][rows].transpose(0, 2, 1)
+                    y_batch[mask] = labels[piece][rows]
+                if carry_X is not None:
+                    X_batch = np.concatenate([carry_X, X_batch])
+                    y_batch = np.concatenate([carry_y, y_batch])
+                    carry_X = carry_y = None
+                if len(X_batch) >= batch_size:
+                    yield X_batch[:batch_size], y_batch[:batch_size]
+                    if len(X_batch) > batch_size:
+                        carry_X, carry_y = X_batch[batch_size:], y_batch[batch_size:]
+                else:
+                    # A short batch at the end of a buffer is topped up from
+                    # the next one
+                    carry_X, carry_y = X_batch, y_batch
+        if carry_X is not None and len(carry_X) and not drop_last:
+            yield carry_X, carry_y
 
 if __name__ == "__main__":
     folder = 'analysis2'
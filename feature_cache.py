@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import json
+import hashlib
+import argparse
+import pandas as pd
+
+# Window features are cached as pickled DataFrames under a key derived from the
+# raw file's content hash plus every parameter that changes the output, so a
+# renamed or touched-but-unchanged file still hits, and any edit misses.
+CACHE_DIR = os.environ.get(
+    "AEROTWIN_FEATURE_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".feature_cache")
+)
+MAX_CACHE_BYTES = int(os.environ.get("AEROTWIN_FEATURE_CACHE_MB", "512")) * 1024 * 1024
+ENTRY_SUFFIX = ".pkl"
+
+_digests = {}
+
+def file_digest(filepath, block_size=1 << 20):
+    # Hashing is memoised per (path, size, mtime) so repeated lookups in one
+    # process only stat the file.
+    st = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        _digests[memo_key] = digest
+    return digest
+
+def cache_key(filepath, *params):
+    parts = [file_digest(filepath)] + [repr(p) for p in params]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+def atomic_write(path, write):
+    # Calls write(tmp_path) on a per-process temporary file next to `path` and
+    # renames it over `path`, so concurrent readers see the old file or the new
+    # one, never a half-written one. The temporary file is removed on failure.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(path, obj, **kwargs):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(obj, f, **kwargs)
+    atomic_write(path, write)
+
+def _entry_path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, key + ENTRY_SUFFIX)
+
+def get(key, cache_dir=None):
+    path = _entry_path(key, cache_dir)
+    try:
+        df = pd.read_pickle(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Discarding unreadable cache entry {path}: {e}")
+        remove(key, cache_dir)
+        return None
+    # The entry's mtime doubles as its last-access time for LRU eviction. It
+    # may already have been evicted by another process; the data read stands.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return df
+
+def put(key, df, cache_dir=None, max_bytes=None):
+    # Caching is best effort: a failed write or eviction is reported, never
+    # raised, so the caller keeps the features it has already computed
+    cache_dir = cache_dir or CACHE_DIR
+    path = _entry_path(key, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        atomic_write(path, df.to_pickle)
+        evict(max_bytes if max_bytes is not None else MAX_CACHE_BYTES, cache_dir)
+    except Exception as e:
+        print(f"Could not write cache entry {path}: {e}")
+
+def remove(key, cache_dir=None):
+    try:
+        os.remove(_entry_path(key, cache_dir))
+    except FileNotFoundError:
+        pass
+
+def entries(cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+    result = []
+    for fname in os.listdir(cache_dir):
+        if fname.endswith(ENTRY_SUFFIX):
+            try:
+                st = os.stat(os.path.join(cache_dir, fname))
+            except FileNotFoundError:
+                # Evicted by another process since the listing
+                continue
+            result.append({
+                "key": fname[:-len(ENTRY_SUFFIX)],
+                "size": st.st_size,
+                "last_access": st.st_mtime,
+            })
+    result.sort(key=lambda e: e["last_access"])
+    return result
+
+def evict(max_bytes=None, cache_dir=None):
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    current = entries(cache_dir)
+    total = sum(e["size"] for e in current)
+    removed = 0
+    for entry in current:
+        if total <= max_bytes:
+            break
+        remove(entry["key"], cache_dir)
+        total -= entry["size"]
+        removed += 1
+    return removed
+
+def purge(cache_dir=None, older_than=None):
+    removed = 0
+    cutoff = time.time() - older_than if older_than is not None else None
+    for entry in entries(cache_dir):
+        if cutoff is None or entry["last_access"] < cutoff:
+            remove(entry["key"], cache_dir)
+            removed += 1
+    return removed
+
+def _format_size(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}"
+        n /= 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or purge the window feature cache.")
+    parser.add_argument("--dir", default=None, help=f"cache directory (default: {CACHE_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="list cached entries, least recently used first")
+    purge_parser = sub.add_parser("purge", help="delete cached entries")
+    purge_parser.add_argument("--older-than", type=float, default=None, metavar="DAYS",
+                              help="only delete entries not used in this many days")
+    evict_parser = sub.add_parser("evict", help="apply LRU eviction down to a size limit")
+    evict_parser.add_argument("--max-mb", type=float, default=MAX_CACHE_BYTES / (1024 * 1024))
+    args = parser.parse_args(argv)
+
+    cache_dir = args.dir or CACHE_DIR
+    if args.command == "info":
+        current = entries(cache_dir)
+        for entry in current:
+            accessed = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry["last_access"]))
+            print(f"{entry['key'][:16]}  {_format_size(entry['size']):>10}  {accessed}")
+        total = sum(e["size"] for e in current)
+        print(f"{len(current)} entries, {_format_size(total)} in {cache_dir} "
+              f"(limit {_format_size(MAX_CACHE_BYTES)})")
+    elif args.command == "purge":
+        older_than = args.older_than * 86400 if args.older_than is not None else None
+        print(f"Removed {purge(cache_dir, older_than)} entries from {cache_dir}")
+    elif args.command == "evict":
+        removed = evict(int(args.max_mb * 1024 * 1024), cache_dir)
+        print(f"Evicted {removed} entries from {cache_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
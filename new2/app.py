@@ -1,9 +1,9 @@
-import threading, time, random, hashlib, json, math, os, csv
+import threading, time, random, hashlib, json, math, cmath, os, csv
 from collections import deque
 from statistics import median
-from flask import Flask, jsonify, request, render_template_string
+from flask import Flask, Response, jsonify, request, render_template_string
 import pandas as pd
-import joblib
+from model_registry import get_model
 
 app = Flask(__name__)
 
@@ -60,6 +60,51 @@ def robust_zscore(x, data):
         return 0
     return 0.6745 * (x - med) / mad
 
+# -------------------------
+# Streaming Spectral Features (Sliding DFT)
+# -------------------------
+class SlidingDFT:
+    """
+    Tracks a fixed set of DFT bins over the last `size` samples of a signal.
+    Each new sample updates every tracked bin in O(1), so a reading costs
+    O(bins) instead of an FFT over the whole sensor history.
+    """
+    def __init__(self, size=32, bins=(1, 2, 4, 8), resync_every=2048):
+        self.size = size
+        self.bins = tuple(bins)
+        self.window = deque([0.0] * size, maxlen=size)
+        self.twiddles = [cmath.exp(2j * math.pi * k / size) for k in self.bins]
+        self.coeffs = [0j] * len(self.bins)
+        self.count = 0
+        self.resync_every = resync_every
+
+    def update(self, x):
+        delta = x - self.window[0]
+        self.window.append(x)
+        self.coeffs = [(c + delta) * w for c, w in zip(self.coeffs, self.twiddles)]
+        self.count += 1
+        # Rounding error accumulates in the recursion; an occasional exact
+        # recompute keeps the bins honest at negligible amortised cost
+        if self.count % self.resync_every == 0:
+            self.resync()
+
+    def resync(self):
+        samples = list(self.window)
+        self.coeffs = [
+            sum(x * cmath.exp(-2j * math.pi * k * m / self.size) for m, x in enumerate(samples))
+            for k in self.bins
+        ]
+
+    @property
+    def ready(self):
+        return self.count >= self.size
+
+    def energies(self):
+        return [abs(c) ** 2 / self.size for c in self.coeffs]
+
+spectral_signals = ("Vibration", "RPM")
+spectral_threshold = 6.0
+
 # -------------------------
 # Dynamic Feature Engineering Function
 # -------------------------
@@ -114,6 +159,10 @@ machine_baselines = {
 }
 
 machine_sensor_history = { machine: deque(maxlen=50) for machine in machine_baselines }
+machine_spectra = {
+    machine: { signal: SlidingDFT() for signal in spectral_signals } for machine in machine_baselines
+}
+machine_spectral_history = { machine: deque(maxlen=50) for machine in machine_baselines }
 
 PR_surge = 10.0
 surge_threshold = 15.0
@@ -133,6 +182,10 @@ def get_recommendation(reading, anomalies):
         recommendations.append("Abnormal pressure ratio detected. Consider modifying design parameters.")
     if "T_in" in anomalies:
         recommendations.append("Inlet temperature deviation detected. Verify ambient conditions.")
+    if "VibrationSpectrum" in anomalies:
+        recommendations.append("Vibration spectrum shift detected. Inspect for blade imbalances.")
+    if "RPMSpectrum" in anomalies:
+        recommendations.append("Periodic rotor speed oscillation detected. Check shaft alignment and speed control.")
     return " ".join(recommendations) if recommendations else "No recommendations; parameters within nominal range."
 
 def generate_sensor_data(machine_id, baseline):
@@ -155,6 +208,13 @@ def generate_sensor_data(machine_id, baseline):
         }
         machine_sensor_history[machine_id].append(new_reading)
         
+        # Band energy over the tracked bins of each monitored signal
+        band_energy = {}
+        for signal, sdft in machine_spectra[machine_id].items():
+            sdft.update(new_reading[signal])
+            if sdft.ready:
+                band_energy[signal] = sum(sdft.energies())
+        
         anomaly = {}
         if len(machine_sensor_history[machine_id]) >= 5:
             history = machine_sensor_history[machine_id]
@@ -181,6 +241,15 @@ def generate_sensor_data(machine_id, baseline):
             if rz_PR > robust_threshold:
                 anomaly["PressureRatio"] = round(new_reading["PressureRatio"], 2)
         
+        spectral_history = machine_spectral_history[machine_id]
+        if len(spectral_history) >= 5:
+            for signal, energy in band_energy.items():
+                energy_list = [h[signal] for h in spectral_history if signal in h]
+                if energy_list and abs(robust_zscore(energy, energy_list)) > spectral_threshold:
+                    anomaly[f"{signal}Spectrum"] = round(energy, 4)
+        if band_energy:
+            spectral_history.append(band_energy)
+        
         if surge_margin < surge_threshold:
             anomaly["SurgeMargin"] = round(surge_margin, 2)
         
@@ -474,6 +543,22 @@ def get_history():
     aggregated_history.sort(key=lambda x: x["timestamp"])
     return jsonify(aggregated_history)
 
+@app.route('/api/spectrum')
+def get_spectrum():
+    spectrum = {}
+    for machine_id, spectra in machine_spectra.items():
+        spectrum[machine_id] = {
+            signal: {
+                "bins": list(sdft.bins),
+                "period_samples": [sdft.size / k for k in sdft.bins],
+                "energies": [round(e, 6) for e in sdft.energies()],
+                "band_energy": round(sum(sdft.energies()), 6),
+                "ready": sdft.ready
+            }
+            for signal, sdft in spectra.items()
+        }
+    return jsonify(spectrum)
+
 @app.route('/api/blockchain')
 def get_blockchain():
     chain_data = []
@@ -505,24 +590,133 @@ def engineered_data_api():
     print("Dynamic engineered data returned:", engineered_data)
     return jsonify(engineered_data)
 
+# Feature columns the throughput model was trained on, in training order
+feature_order = [
+    "machine_count",
+    "avg_T_in", "std_T_in",
+    "avg_T_out", "std_T_out",
+    "avg_RPM", "std_RPM",
+    "avg_Vibration", "std_Vibration",
+    "cycle_time",
+    "energy_consumption",
+    "estimated_travel_distance"
+]
+
 @app.route('/predict', methods=["POST"])
 def predict():
     import pandas as pd
     data_input = request.get_json()
-    feature_order = [
-        "machine_count",
-        "avg_T_in", "std_T_in",
-        "avg_T_out", "std_T_out",
-        "avg_RPM", "std_RPM",
-        "avg_Vibration", "std_Vibration",
-        "cycle_time",
-        "energy_consumption",
-        "estimated_travel_distance"
-    ]
     input_df = pd.DataFrame([data_input], columns=feature_order)
-    model = joblib.load("throughput_model.pkl")
+    model, model_version = get_model()
     predicted = model.predict(input_df)[0]
-    return jsonify({"predicted_throughput": round(predicted, 2)})
+    return jsonify({"predicted_throughput": round(predicted, 2), "model_version": model_version})
+
+# Batch prediction: a JSON array of scenarios or NDJSON (one scenario per
+# line) in, NDJSON out in input order. A scenario is an object keyed by
+# feature name or an array of values in feature_order. Invalid rows get an
+# error line of their own; all valid rows go through a single vectorized
+# model.predict call.
+MAX_BATCH_ROWS = 100000
+
+def is_ndjson(text):
+    lines = text.splitlines()
+    if len(lines) < 2:
+        return False
+    try:
+        json.loads(lines[0])
+    except ValueError:
+        return False
+    return True
+
+def parse_batch_rows(body, content_type):
+    # Returns a list of (row, error) pairs in input order
+    text = body.strip()
+    if "ndjson" not in content_type and text.startswith("["):
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            # Array-form scenarios one per line, sent without the NDJSON
+            # type, parse line by line; anything else is a broken array
+            if not is_ndjson(text):
+                raise ValueError(f"Invalid JSON array: {e}")
+        else:
+            return [(row, None) for row in rows]
+    parsed = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            parsed.append((json.loads(line), None))
+        except ValueError as e:
+            parsed.append((None, f"Invalid JSON: {e}"))
+    return parsed
+
+def validate_scenario(row, features):
+    if isinstance(row, (list, tuple)):
+        # Values by position in feature_order
+        if len(row) != len(features):
+            return None, f"Scenario array must have {len(features)} values in feature order, got {len(row)}."
+        row = dict(zip(features, row))
+    if not isinstance(row, dict):
+        return None, "Scenario must be a JSON object or an array of feature values."
+    missing = [name for name in features if name not in row]
+    if missing:
+        return None, f"Missing features: {', '.join(missing)}"
+    values = []
+    for name in features:
+        value = row[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None, f"Feature '{name}' must be a finite number."
+        try:
+            # A JSON integer too large for a float overflows here
+            value = float(value)
+        except OverflowError:
+            return None, f"Feature '{name}' must be a finite number."
+        if not math.isfinite(value):
+            return None, f"Feature '{name}' must be a finite number."
+        values.append(value)
+    return values, None
+
+@app.route('/predict/batch', methods=["POST"])
+def predict_batch():
+    try:
+        parsed = parse_batch_rows(request.get_data(as_text=True), request.content_type or "")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if len(parsed) > MAX_BATCH_ROWS:
+        return jsonify({"error": f"Batch too large ({len(parsed)} rows, limit {MAX_BATCH_ROWS})."}), 413
+
+    results = []
+    valid_positions, valid_values = [], []
+    for i, (row, error) in enumerate(parsed):
+        values = None
+        if error is None:
+            values, error = validate_scenario(row, feature_order)
+        results.append(error)
+        if values is not None:
+            valid_positions.append(i)
+            valid_values.append(values)
+
+    try:
+        model, model_version = get_model()
+        predictions = {}
+        if valid_values:
+            predicted = model.predict(pd.DataFrame(valid_values, columns=feature_order))
+            predictions = dict(zip(valid_positions, predicted))
+    except Exception as e:
+        print("Error in /predict/batch:", e)
+        return jsonify({"error": "Prediction failed."}), 500
+
+    def generate():
+        for i, error in enumerate(results):
+            if error is not None:
+                line = {"index": i, "error": error, "model_version": model_version}
+            else:
+                line = {"index": i, "predicted_throughput": round(float(predictions[i]), 2),
+                        "model_version": model_version}
+            yield json.dumps(line) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
 
 # -------------------------
 # Layout Optimizer & Simulator (Unchanged)
@@ -3,7 +3,7 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
+from model_registry import save_model
 
 # Step 1: Load the Engineered Data
 # The engineered CSV was created in Step 2 (feature_engineering.py)
@@ -46,5 +46,5 @@ print("Mean Squared Error:", mse)
 print("R² Score:", r2)
 
 # Step 7: Save the Trained Model for Later Use
-joblib.dump(model, "throughput_model.pkl")
+save_model(model, "throughput_model.pkl")
 print("Trained model saved as throughput_model.pkl")
@@ -0,0 +1,73 @@
+# model_registry.py
+import io
+import os
+import time
+import hashlib
+import threading
+import joblib
+
+MODEL_PATH = "throughput_model.pkl"
+
+class ModelRegistry:
+    """
+    Keeps the throughput model in memory and reloads it when the file on
+    disk changes (e.g. after model_training.py retrains it).
+
+    Requests read the current (model, version) pair without locking; a reload
+    builds the new pair completely and swaps it in with a single assignment,
+    so a request sees either the old model or the new one, never a mix.
+    """
+
+    def __init__(self, path=MODEL_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._current = None      # (model, version)
+        self._stat = None         # (mtime_ns, size) of the loaded file
+        self._digest = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        with self._lock:
+            st = os.stat(self.path)
+            stat = (st.st_mtime_ns, st.st_size)
+            self._checked_at = time.monotonic()
+            if stat == self._stat and self._current is not None:
+                return
+            # mtime alone also changes on a touch or an identical re-save;
+            # the content hash decides whether the model really changed. The
+            # model is unpickled from the same bytes that were hashed.
+            with open(self.path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if digest != self._digest or self._current is None:
+                model = joblib.load(io.BytesIO(data))
+                self._current = (model, digest[:12])
+                self._digest = digest
+                print(f"Loaded model {self.path} (version {digest[:12]})")
+            self._stat = stat
+
+    def get(self):
+        # Returns (model, version), reloading first if the file changed
+        if self._current is None or time.monotonic() - self._checked_at >= self.check_interval:
+            try:
+                self._reload_if_changed()
+            except Exception as e:
+                # Keep serving the previous model if the new file is missing
+                # or unreadable; only fail when nothing was ever loaded
+                if self._current is None:
+                    raise
+                print(f"Model reload failed, keeping version {self._current[1]}: {e}")
+        return self._current
+
+registry = ModelRegistry()
+
+def get_model():
+    return registry.get()
+
+def save_model(model, path=MODEL_PATH):
+    # Write to a temporary file and rename it over the old one, so a registry
+    # polling the path never reads a half-written model
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
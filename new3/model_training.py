@@ -2,7 +2,7 @@
 import pandas as pd
 import time
 import os
-import joblib
+from model_registry import save_model
 from sklearn.linear_model import LinearRegression
 
 def retrain_model():
@@ -18,7 +18,9 @@ def retrain_model():
     
     model = LinearRegression()
     model.fit(X, y)
-    joblib.dump(model, "throughput_model.pkl")
+    # Atomic replace, so the running app's model registry picks up the new
+    # version on its next check and never sees a partial file
+    save_model(model, "throughput_model.pkl")
     print("Model retrained and saved to throughput_model.pkl.")
 
 if __name__ == "__main__":
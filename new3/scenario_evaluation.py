@@ -1,10 +1,10 @@
 # dynamic_scenario_evaluation.py
 import pandas as pd
-import joblib
+from model_registry import get_model
 
 def evaluate_scenario(scenario):
-    # Load the most recent model.
-    model = joblib.load("throughput_model.pkl")
+    # The registry keeps the model loaded and swaps in retrained versions.
+    model, _ = get_model()
     scenario_df = pd.DataFrame(scenario)
     predicted = model.predict(scenario_df)
     return predicted[0]
@@ -0,0 +1,199 @@
+import os
+import sys
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.decomposition import IncrementalPCA
+
+import feature_cache
+from utils import META_COLUMNS, SCENARIO_MANIFEST, iter_file_features, scenario_files
+
+# Reconstruction-error detector over window features. It is fitted by
+# streaming feature blocks out of the recordings in mini-batches, so neither
+# the raw data nor the feature matrix has to fit in memory at once.
+DETECTOR_VERSION = 3
+
+def detector_path(scenario, component, window_size=100, step=50, cache_dir=None):
+    name = f"pca_{scenario}_{component}_w{window_size}_s{step}".replace(" ", "_").lower()
+    return os.path.join(cache_dir or feature_cache.CACHE_DIR, name + ".joblib")
+
+def _iter_batches(files, window_size, step, batch_size, chunksize, columns=None):
+    # Fixed-size float64 batches of feature rows; `columns` pins the layout to
+    # the first block's so every batch lines up with the fitted model.
+    buffer = []
+    buffered = 0
+    for file, label in files:
+        if not os.path.exists(file):
+            print(f"File {file} not found.")
+            continue
+        for block in iter_file_features(file, label, window_size, step, chunksize):
+            if columns is None:
+                columns = [col for col in block.columns if col not in META_COLUMNS]
+            buffer.append(block.reindex(columns=columns).to_numpy(dtype=np.float64))
+            buffered += len(buffer[-1])
+            while buffered >= batch_size:
+                rows = np.vstack(buffer)
+                yield columns, rows[:batch_size]
+                buffer = [rows[batch_size:]]
+                buffered = len(buffer[0])
+    if buffered:
+        yield columns, np.vstack(buffer)
+
+def fit_pca_detector(files, window_size=100, step=50, variance=0.95, quantile=0.9, batch_size=4096,
+                     chunksize=100000):
+    # Three streaming passes: per-feature mean/scale, partial_fit on the
+    # standardised batches, then reconstruction errors for the threshold.
+    # The threshold is the `quantile` of training errors, so 0.9 flags the
+    # same share of windows as IsolationForest(contamination=0.1).
+    # Features a recording lacks (e.g. header-derived columns of another file)
+    # are NaN; each feature's mean and spread come from its own observed
+    # values, and later passes impute missing values with that mean.
+    columns = None
+    count = 0
+    observed = mean = m2 = None
+    for columns, rows in _iter_batches(files, window_size, step, batch_size, chunksize):
+        # Batch mean/M2 merged with Chan's update, as build_window_pyramid;
+        # sum-of-squares cancels on large offsets such as the 333.15 K tanks
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            batch_n = (~np.isnan(rows)).sum(axis=0)
+            batch_mean = np.where(batch_n > 0, np.nanmean(rows, axis=0), 0.0)
+            batch_m2 = np.nansum((rows - batch_mean) ** 2, axis=0)
+        if mean is None:
+            observed, mean, m2 = batch_n, batch_mean, batch_m2
+        else:
+            merged = observed + batch_n
+            delta = batch_mean - mean
+            with np.errstate(all='ignore'):
+                share = np.where(merged > 0, batch_n / merged, 0.0)
+            mean = mean + delta * share
+            m2 = m2 + batch_m2 + delta ** 2 * observed * share
+            observed = merged
+        count += len(rows)
+    if not count:
+        return None
+    with np.errstate(all='ignore'):
+        scale = np.where(observed > 0, np.sqrt(m2 / observed), 0.0)
+    # Spread at the level of float rounding of the feature's magnitude is no
+    # signal; such features are left unscaled like constant ones
+    scale[scale <= 1e-12 * np.maximum(np.abs(mean), 1.0)] = 1.0
+
+    n_features = len(columns)
+    if count <= n_features:
+        print(f"Not enough windows ({count}) to fit {n_features} features")
+        return None
+    pca = IncrementalPCA(n_components=n_features)
+    batches = ((_impute(rows, mean) - mean) / scale
+               for _, rows in _iter_batches(files, window_size, step, max(batch_size, n_features), chunksize,
+                                            columns))
+    # partial_fit needs at least n_components rows; only the tail batch can be
+    # shorter, and it is folded into the one before it
+    previous = next(batches)
+    for rows in batches:
+        if len(rows) < n_features:
+            previous = np.vstack([previous, rows])
+        else:
+            pca.partial_fit(previous)
+            previous = rows
+    pca.partial_fit(previous)
+
+    k = int(np.searchsorted(np.cumsum(pca.explained_variance_ratio_), variance) + 1)
+    k = min(k, n_features)
+    components = pca.components_[:k]
+    detector = {
+        'version': DETECTOR_VERSION,
+        'columns': columns,
+        'mean': mean,
+        'scale': scale,
+        'pca_mean': pca.mean_,
+        'components': components,
+        'explained_variance_ratio': pca.explained_variance_ratio_[:k],
+        # Scaling and residual projection folded into one matrix, so scoring
+        # a batch of windows is a single matmul
+        'residual': (np.eye(n_features) - components.T @ components) / scale[:, None],
+        'offset': mean + scale * pca.mean_,
+        'windows': count,
+    }
+    errors = np.concatenate([score_array(detector, rows)
+                             for _, rows in _iter_batches(files, window_size, step, batch_size, chunksize,
+                                                          columns)])
+    # Flat stretches give many windows exactly the same error; the margin
+    # keeps rounding differences (e.g. pyramid-merged features) from pushing
+    # that whole tie over the threshold
+    threshold = float(np.quantile(errors, quantile))
+    detector['threshold'] = threshold + 1e-6 * abs(threshold) + 1e-12
+    return detector
+
+def _impute(rows, mean):
+    # Missing features take the fitted mean, i.e. 0 once standardised
+    return np.where(np.isnan(rows), mean, rows)
+
+def score_array(detector, rows):
+    residual = (_impute(rows, detector['mean']) - detector['offset']) @ detector['residual']
+    return np.einsum('ij,ij->i', residual, residual)
+
+def score_windows(detector, data):
+    # Reconstruction error per row of a feature frame
+    rows = data.reindex(columns=detector['columns']).to_numpy(dtype=np.float64)
+    return pd.Series(score_array(detector, rows), index=data.index, name='pca_error')
+
+def predict(detector, data):
+    # IsolationForest convention: -1 for anomalies, 1 for normal windows
+    return np.where(score_windows(detector, data).to_numpy() > detector['threshold'], -1, 1)
+
+def load_detector(path):
+    try:
+        detector = joblib.load(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Discarding unreadable detector {path}: {e}")
+        return None
+    return detector if detector.get('version') == DETECTOR_VERSION else None
+
+def save_detector(detector, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    feature_cache.atomic_write(path, lambda tmp_path: joblib.dump(detector, tmp_path))
+
+def load_or_fit_detector(scenario, component, window_size=100, step=50, refit=False, data_dir="analysis"):
+    files = scenario_files(scenario, component, data_dir)
+    existing = [file for file, _ in files if os.path.exists(file)]
+    digests = {os.path.basename(file): feature_cache.file_digest(file) for file in existing}
+    path = detector_path(scenario, component, window_size, step)
+    detector = None if refit else load_detector(path)
+    if detector is not None and detector.get('sources') == digests:
+        return detector
+    try:
+        detector = fit_pca_detector(files, window_size, step)
+    except Exception as e:
+        # A recording that fails to read part way would leave the fit on a
+        # truncated stream; no detector is better than a skewed one
+        print(f"Error fitting PCA detector for {scenario} / {component}: {e}")
+        return None
+    if detector is None:
+        return None
+    detector['sources'] = digests
+    save_detector(detector, path)
+    return detector
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit incremental PCA anomaly detectors on window features.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIO_MANIFEST))
+    parser.add_argument("--window-size", type=int, default=100)
+    parser.add_argument("--step", type=int, default=50)
+    parser.add_argument("--refit", action="store_true")
+    args = parser.parse_args(argv)
+
+    for scenario in args.scenario or SCENARIO_MANIFEST:
+        for component in SCENARIO_MANIFEST[scenario]:
+            detector = load_or_fit_detector(scenario, component, args.window_size, args.step, args.refit)
+            if detector:
+                print(f"✅ {scenario} / {component}: {len(detector['components'])} of "
+                      f"{len(detector['columns'])} components, {detector['windows']} windows, "
+                      f"threshold {detector['threshold']:.3g}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from feature_cache import atomic_write_json
+
+# Each CSV recording can be converted once into a directory of typed .npy
+# column files next to it (Fault_Type2_Driver.csv -> Fault_Type2_Driver.cols/).
+# Reads then memory-map only the columns they need instead of re-parsing text.
+STORE_SUFFIX = ".cols"
+META_FILE = "meta.json"
+
+def store_path(csv_path):
+    root, ext = os.path.splitext(csv_path)
+    return (root if ext.lower() == ".csv" else csv_path) + STORE_SUFFIX
+
+def _load_meta(csv_path):
+    meta_path = os.path.join(store_path(csv_path), META_FILE)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    # A binary copy older than (or of a different size than) its CSV is stale
+    try:
+        st = os.stat(csv_path)
+    except FileNotFoundError:
+        return meta
+    if meta.get("source_size") != st.st_size or meta.get("source_mtime_ns") != st.st_mtime_ns:
+        return None
+    return meta
+
+def has_binary(csv_path):
+    return _load_meta(csv_path) is not None
+
+def convert_recording(csv_path, force=False):
+    if not force and has_binary(csv_path):
+        return store_path(csv_path)
+    df = pd.read_csv(csv_path)
+    non_numeric = [col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col])]
+    if non_numeric:
+        print(f"Skipping {csv_path}: non-numeric columns {non_numeric}")
+        return None
+
+    out_dir = store_path(csv_path)
+    os.makedirs(out_dir, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        fname = f"c{i}.npy"
+        np.save(os.path.join(out_dir, fname), np.ascontiguousarray(df[col].to_numpy()))
+        columns.append({"name": str(col), "file": fname, "dtype": str(df[col].dtype)})
+
+    st = os.stat(csv_path)
+    meta = {
+        "rows": len(df),
+        "columns": columns,
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+    }
+    # meta.json is written last, so a half-converted directory is never used
+    atomic_write_json(os.path.join(out_dir, META_FILE), meta, indent=2)
+    return out_dir
+
+def convert_folder(folder, force=False):
+    converted = []
+    for fname in sorted(os.listdir(folder)):
+        if fname.lower().endswith(".csv"):
+            out_dir = convert_recording(os.path.join(folder, fname), force)
+            if out_dir:
+                converted.append(out_dir)
+    return converted
+
+def open_recording(csv_path):
+    # Returns {column name: read-only memmap} for a converted recording, or None
+    meta = _load_meta(csv_path)
+    if meta is None:
+        return None
+    out_dir = store_path(csv_path)
+    return {
+        col["name"]: np.load(os.path.join(out_dir, col["file"]), mmap_mode="r")
+        for col in meta["columns"]
+    }
+
+def _select(names, columns):
+    if columns is None:
+        return list(names)
+    return [names[c] if isinstance(c, int) else c for c in columns]
+
+def read_recording(csv_path, columns=None):
+    # `columns` may hold names or positions. With a binary copy only those
+    # columns are mapped; the CSV fallback can only skip parsing by position.
+    mapped = open_recording(csv_path)
+    if mapped is not None:
+        names = _select(list(mapped), columns)
+        # copy=False keeps every column a view of its memmap, so reopening a
+        # converted recording does not read it into memory
+        return pd.DataFrame({name: mapped[name] for name in names}, copy=False)
+    if columns is not None and all(isinstance(c, int) for c in columns):
+        return pd.read_csv(csv_path, usecols=list(columns))
+    df = pd.read_csv(csv_path)
+    return df if columns is None else df[_select(list(df.columns), columns)]
+
+def iter_recording_chunks(csv_path, chunksize):
+    mapped = open_recording(csv_path)
+    if mapped is None:
+        with pd.read_csv(csv_path, chunksize=chunksize) as reader:
+            yield from reader
+        return
+    n_rows = len(next(iter(mapped.values()))) if mapped else 0
+    for start in range(0, n_rows, chunksize):
+        yield pd.DataFrame({name: values[start:start + chunksize] for name, values in mapped.items()}, copy=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert CSV recordings to memory-mappable column files.")
+    parser.add_argument("paths", nargs="*", default=["analysis"], help="CSV files or folders (default: analysis)")
+    parser.add_argument("--force", action="store_true", help="rewrite existing binary copies")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        if os.path.isdir(path):
+            converted = convert_folder(path, args.force)
+        else:
+            converted = [out for out in [convert_recording(path, args.force)] if out]
+        for out_dir in converted:
+            print(f"✅ {out_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import feature_cache
+from recording_store import read_recording
+from utils import SCENARIO_MANIFEST, file_component, run_name, scenario_files, _rename_map
+
+def _fft_length(n):
+    return 1 << int(n - 1).bit_length()
+
+def cross_correlation(x, y, max_lag=None):
+    # Normalised cross-correlation of two equal-length series for lags
+    # -max_lag..max_lag via one zero-padded rfft product, O(n log n) instead
+    # of O(n * lags). A positive lag means y follows x by that many samples.
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = min(len(x), len(y))
+    x, y = x[:n], y[:n]
+    max_lag = n - 1 if max_lag is None else min(int(max_lag), n - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+
+    x = x - np.nanmean(x)
+    y = y - np.nanmean(y)
+    scale = n * np.sqrt(np.nanmean(x * x) * np.nanmean(y * y))
+    if not np.isfinite(scale) or scale == 0:
+        return lags, np.full(len(lags), np.nan)
+
+    # Padding to n + max_lag keeps the circular product free of wrap-around
+    # for every lag we keep
+    nfft = _fft_length(n + max_lag)
+    spectrum = np.conj(np.fft.rfft(np.nan_to_num(x), nfft)) * np.fft.rfft(np.nan_to_num(y), nfft)
+    circular = np.fft.irfft(spectrum, nfft)
+    corr = np.concatenate([circular[nfft - max_lag:], circular[:max_lag + 1]]) / scale
+    return lags, corr
+
+def _peak(lags, corr):
+    if np.all(np.isnan(corr)):
+        return None, np.nan
+    i = int(np.nanargmax(np.abs(corr)))
+    return int(lags[i]), float(corr[i])
+
+def peak_lag(x, y, max_lag=None):
+    return _peak(*cross_correlation(x, y, max_lag))
+
+def run_signals(files):
+    # Primary channel of each component recording in one run, named as in the
+    # feature frames (DriverPower, PumpMotorSpeed, ...) and truncated to the
+    # shortest so samples line up.
+    signals = {}
+    for file in files:
+        if not os.path.exists(file):
+            print(f"File {file} not found.")
+            continue
+        try:
+            # The rename map depends on the full column layout (a tank file
+            # with two numeric columns is TankVolume/TankTemperature), so it
+            # is taken from a small sample of every column before only the
+            # first column is read
+            sample = pd.read_csv(file, nrows=100)
+            df = read_recording(file, columns=[0])
+        except Exception as e:
+            print(f"Error reading {file}: {e}")
+            continue
+        # Header-less recordings name their first column after its first
+        # value, so the channel is named by position rather than by header
+        col = df.columns[0]
+        name = next(iter(_rename_map(file, sample).values()), f"{file_component(file)}_0")
+        signals[name] = df[col].to_numpy(dtype=np.float64)
+    if not signals:
+        return {}
+    n = min(len(values) for values in signals.values())
+    return {name: values[:n] for name, values in signals.items()}
+
+def lagged_correlations(files, max_lag=2000, return_curves=False):
+    # One row per run and signal pair with the lead/lag at peak |correlation|.
+    # `files` is a (path, label) list as returned by utils.scenario_files.
+    runs = {}
+    for file, label in files:
+        runs.setdefault((run_name(file), label), []).append(file)
+
+    rows = []
+    curves = {}
+    for (run, label), run_files in runs.items():
+        signals = run_signals(run_files)
+        names = list(signals)
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                lags, corr = cross_correlation(signals[a], signals[b], max_lag)
+                lag, peak = _peak(lags, corr)
+                rows.append({
+                    'run': run,
+                    'label': label,
+                    'signal_a': a,
+                    'signal_b': b,
+                    'lag': lag,
+                    'peak_corr': peak,
+                    'zero_lag_corr': float(corr[len(lags) // 2]),
+                })
+                curves[(run, a, b)] = (lags, corr)
+    result = pd.DataFrame(rows, columns=['run', 'label', 'signal_a', 'signal_b', 'lag', 'peak_corr',
+                                         'zero_lag_corr'])
+    return (result, curves) if return_curves else result
+
+def _robust_scale(x):
+    # MAD of the whole recording: the smooth simulated channels have almost
+    # no sample-to-sample noise, so a difference-based scale would make every
+    # bend of a ramp a change point
+    scale = 1.4826 * np.median(np.abs(x - np.median(x)))
+    return scale if scale > 0 else np.std(x)
+
+def pelt_segments(signal, penalty=None, min_size=500, jump=10):
+    # PELT change-point search under an L2 (mean shift) cost. Segment costs
+    # come from cumulative sums in O(1); candidates that can no longer start
+    # the optimal last segment are pruned, so typical runtime is near linear.
+    # Breakpoints are restricted to multiples of `jump`. Returns the sorted
+    # segment end indices, the last one being len(signal).
+    x = np.asarray(signal, dtype=np.float64)
+    n = len(x)
+    if n < 2 * min_size:
+        return [n]
+    if np.isnan(x).any():
+        # Filled rather than dropped so breakpoints stay sample positions
+        x = np.where(np.isnan(x), np.nanmedian(x), x)
+    scale = _robust_scale(x)
+    if not np.isfinite(scale) or scale == 0:
+        return [n]
+    x = (x - np.median(x)) / scale
+    if penalty is None:
+        penalty = 2.0 * np.log(n)
+
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    csum2 = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    def cost(starts, end):
+        length = end - starts
+        total = csum[end] - csum[starts]
+        return (csum2[end] - csum2[starts]) - total * total / length
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+    ends = np.append(np.arange(jump, n, jump), n)
+    for end in ends:
+        ready = candidates[end - candidates >= min_size]
+        if ready.size == 0:
+            continue
+        costs = best[ready] + cost(ready, end)
+        i = int(np.argmin(costs))
+        best[end] = costs[i] + penalty
+        last[end] = ready[i]
+        recent = candidates[end - candidates < min_size]
+        candidates = np.concatenate((ready[costs <= best[end]], recent, [end]))
+
+    breakpoints = []
+    end = n
+    while end > 0:
+        breakpoints.append(int(end))
+        end = last[end]
+    return breakpoints[::-1]
+
+def _rolling_mean_std(x, m):
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    csum2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    mean = (csum[m:] - csum[:-m]) / m
+    var = (csum2[m:] - csum2[:-m]) / m - mean * mean
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+def matrix_profile(signal, m, block=1024):
+    # z-normalised matrix profile: for every length-m subsequence, the distance
+    # to its nearest non-trivial match and that match's position. Rows are
+    # processed in blocks: the first row's sliding dot products come from one
+    # FFT (MASS) and the rest of the block follows by the STOMP recurrence,
+    # which re-seeding from the FFT each block keeps from drifting. Memory is
+    # O(len(signal)) whatever the recording length.
+    x = np.asarray(signal, dtype=np.float64)
+    if np.isnan(x).any():
+        x = np.where(np.isnan(x), np.nanmedian(x), x)
+    n = len(x)
+    count = n - m + 1
+    if m < 4 or count < 2:
+        raise ValueError(f"Subsequence length {m} does not fit a series of {n} samples")
+
+    mean, std = _rolling_mean_std(x, m)
+    # Flat stretches (common in the simulated channels) have no shape; they
+    # match each other exactly and nothing else
+    flat = std < 1e-8 * max(np.abs(x).max(), 1.0)
+    safe_std = np.where(flat, 1.0, std)
+    exclusion = max(1, m // 4)
+    nfft = _fft_length(n + m)
+    x_spectrum = np.fft.rfft(x, nfft)
+
+    profile = np.empty(count)
+    index = np.empty(count, dtype=np.int64)
+    head = x[:count]
+    tail = x[m - 1:]
+    for start in range(0, count, block):
+        query = x[start:start + m][::-1]
+        dots = np.fft.irfft(np.fft.rfft(query, nfft) * x_spectrum, nfft)[m - 1:m - 1 + count]
+        for i in range(start, min(start + block, count)):
+            if i > start:
+                dots[1:] = dots[:-1] - x[i - 1] * head[:-1] + x[i + m - 1] * tail[1:]
+                dots[0] = x[i:i + m] @ x[:m]
+            if flat[i]:
+                dist_sq = np.where(flat, 0.0, float(m))
+            else:
+                corr = (dots - m * mean[i] * mean) / (m * std[i] * safe_std)
+                dist_sq = 2 * m * (1 - np.clip(corr, -1.0, 1.0))
+                dist_sq[flat] = m
+            dist_sq[max(0, i - exclusion + 1):i + exclusion] = np.inf
+            nearest = int(np.argmin(dist_sq))
+            profile[i] = np.sqrt(dist_sq[nearest])
+            index[i] = nearest
+    return profile, index
+
+def _top_k(order, m, k):
+    # Greedy pick along `order`, skipping positions that overlap a chosen one
+    chosen = []
+    for i in order:
+        if all(abs(int(i) - j) >= m for j in chosen):
+            chosen.append(int(i))
+            if len(chosen) == k:
+                break
+    return chosen
+
+def discords(profile, m, k=3):
+    finite = np.where(np.isfinite(profile), profile, -np.inf)
+    return _top_k(np.argsort(finite)[::-1], m, k)
+
+def motifs(profile, index, m, k=3):
+    # Pairs of mutually close subsequences, closest first
+    pairs = []
+    for i in _top_k(np.argsort(profile), m, 2 * k):
+        j = int(index[i])
+        if all(abs(j - a) >= m and abs(j - b) >= m for a, b in pairs) and abs(i - j) >= m:
+            pairs.append((i, j))
+        if len(pairs) == k:
+            break
+    return pairs
+
+def recording_matrix_profile(filepath, m=100, max_points=20000, block=1024):
+    # Matrix profile of a recording's primary channel. Recordings longer than
+    # max_points are mean-pooled by an integer factor first (m shrinks with
+    # them); positions in the result are mapped back to raw sample indices.
+    values = read_recording(filepath, columns=[0]).iloc[:, 0].to_numpy(dtype=np.float64)
+    factor = max(1, -(-len(values) // max_points)) if max_points else 1
+    if factor > 1:
+        usable = len(values) // factor * factor
+        values = values[:usable].reshape(-1, factor).mean(axis=1)
+    m_pooled = max(4, m // factor)
+    profile, index = matrix_profile(values, m_pooled, block)
+    return {
+        'factor': factor,
+        'm': m_pooled * factor,
+        'profile': profile,
+        'index': index * factor,
+        'discords': [i * factor for i in discords(profile, m_pooled)],
+        'motifs': [(i * factor, j * factor) for i, j in motifs(profile, index, m_pooled)],
+    }
+
+def window_discord_scores(data, window_size=100, step=50, m=None, max_points=20000, data_dir="analysis"):
+    # Per-window discord score for a feature frame: the highest matrix-profile
+    # distance of any subsequence starting inside the window. Windows of one
+    # source are contiguous and start at k * step, as extract_features emits.
+    m = m or window_size
+    scores = pd.Series(np.nan, index=data.index, name='mp_discord')
+    for source, rows in data.groupby('source', sort=False, observed=True).indices.items():
+        try:
+            mp = recording_matrix_profile(os.path.join(data_dir, source), m, max_points)
+        except Exception as e:
+            print(f"Error computing matrix profile for {source}: {e}")
+            continue
+        per_sample = np.repeat(mp['profile'], mp['factor'])
+        starts = np.arange(len(rows)) * step
+        padded = np.concatenate((per_sample, np.full(window_size, np.nan)))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window_size)[starts[starts < len(per_sample)]]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            values = np.full(len(rows), np.nan)
+            values[:len(windows)] = np.nanmax(windows, axis=1)
+        scores.iloc[rows] = values
+    return scores
+
+# Segmentations are small JSON files kept beside the feature cache and keyed
+# the same way: raw file content hash plus every parameter of the search.
+SEGMENTS_DIR = os.path.join(feature_cache.CACHE_DIR, "segments")
+
+def _segments_path(filepath, penalty, min_size, jump):
+    key = feature_cache.cache_key(filepath, 'pelt', penalty, min_size, jump)
+    return os.path.join(SEGMENTS_DIR, key + ".json")
+
+def segment_recording(filepath, penalty=None, min_size=500, jump=10, force=False):
+    # Segments the recording's primary channel, reusing a stored result when
+    # the file and parameters are unchanged. Returns None if it cannot be read.
+    try:
+        path = _segments_path(filepath, penalty, min_size, jump)
+    except FileNotFoundError:
+        print(f"File {filepath} not found.")
+        return None
+    if not force:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    try:
+        df = read_recording(filepath, columns=[0])
+    except Exception as e:
+        print(f"Error reading {filepath}: {e}")
+        return None
+    values = df.iloc[:, 0].to_numpy(dtype=np.float64)
+    result = {
+        'source': os.path.basename(filepath),
+        'rows': len(values),
+        'breakpoints': pelt_segments(values, penalty, min_size, jump),
+        'penalty': penalty,
+        'min_size': min_size,
+        'jump': jump,
+    }
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+    feature_cache.atomic_write_json(path, result)
+    return result
+
+def _segment_job(args):
+    return segment_recording(*args)
+
+def segment_scenarios(scenarios=None, workers=None, penalty=None, min_size=500, jump=10, force=False,
+                      data_dir=None):
+    # Batch job over every recording the scenario loaders read
+    files = []
+    for scenario in scenarios or SCENARIO_MANIFEST:
+        kwargs = {'data_dir': data_dir} if data_dir else {}
+        for file, _ in scenario_files(scenario, **kwargs):
+            if file not in files and os.path.exists(file):
+                files.append(file)
+    jobs = [(file, penalty, min_size, jump, force) for file in files]
+    if workers == 1 or len(jobs) <= 1:
+        results = [_segment_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_segment_job, jobs))
+    return dict(zip(files, results))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Segment raw recordings at change points (PELT).")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIO_MANIFEST),
+                        help="limit to a scenario (repeatable; default: all)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--penalty", type=float, default=None, help="default: 2 log(n) in robust units")
+    parser.add_argument("--min-size", type=int, default=500)
+    parser.add_argument("--jump", type=int, default=10)
+    parser.add_argument("--force", action="store_true", help="recompute stored segmentations")
+    args = parser.parse_args(argv)
+
+    results = segment_scenarios(args.scenario, args.workers, args.penalty, args.min_size, args.jump, args.force)
+    for file, result in results.items():
+        if result:
+            print(f"✅ {file}: {len(result['breakpoints']) - 1} change points")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,22 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os 
 from AeroTwinOps.utils import (
-    load_scenario1_data,
-    load_scenario2_data,
-    load_scenario3_data,
-    perform_predictive_analysis
+    META_COLUMNS,
+    load_scenario,
+    perform_predictive_analysis,
+    scenario_files,
+    select_component
 )
+from AeroTwinOps.recording_store import read_recording
+from AeroTwinOps.signal_analysis import (
+    lagged_correlations,
+    recording_matrix_profile,
+    segment_recording,
+    window_discord_scores
+)
+from AeroTwinOps.window_index import query as query_similar_windows, update_index
+from AeroTwinOps.pca_detector import load_or_fit_detector, predict as pca_predict
+from AeroTwinOps.cmaps_loader import load_cmaps_index, read_unit
 from sklearn.ensemble import IsolationForest
 
 st.set_page_config(page_title="Digital Twin Analysis", layout="wide")
@@ -19,39 +30,70 @@ st.title("Digital Twin Simulation & Predictive Analysis")
 st.sidebar.header("Settings")
 scenario = st.sidebar.selectbox("Select Scenario:", ["Scenario 1", "Scenario 2", "Scenario 3"])
 component = st.sidebar.selectbox("Select System Component:", ["Hydraulic Pump", "Tanks", "Engines", "Pumps"])
+window_size = st.sidebar.selectbox("Window Size (samples):", [50, 100, 200, 400], index=1)
+compact = st.sidebar.checkbox("Compact memory layout", value=False)
+max_lag = st.sidebar.number_input("Max cross-correlation lag (samples):", min_value=10, max_value=20000,
+                                  value=2000, step=100)
+detector_name = st.sidebar.selectbox("Anomaly detector:", ["Isolation Forest", "Incremental PCA"])
+use_discord_score = st.sidebar.checkbox("Add matrix-profile discord score to anomaly detection", value=False)
 
 # Load the appropriate data
 @st.cache_data
-def load_data(scenario):
-    if scenario == "Scenario 1":
-        return load_scenario1_data()
-    elif scenario == "Scenario 2":
-        return load_scenario2_data()
-    elif scenario == "Scenario 3":
-        return load_scenario3_data()
-
-data = load_data(scenario)
-if data is None or data.empty:
-    st.error("No data available. Please check your CSV files.")
-    st.stop()
+def load_data(scenario, component, window_size, compact):
+    # Windows overlap by half; both sizes stay multiples of the pyramid base,
+    # so switching window size re-merges cached block statistics
+    step = window_size // 2
+    return load_scenario(scenario, component, window_size, step, compact=compact)
 
-# Filter data based on component
-comp_lower = component.lower()
-if comp_lower == "hydraulic pump":
-    filtered_data = data[data['source'].str.lower().str.contains("phydraulique")]
-elif comp_lower == "tanks":
-    filtered_data = data[data['source'].str.lower().str.contains("tank")]
-elif comp_lower == "engines":
-    filtered_data = data[data['source'].str.lower().str.contains("driver")]
-elif comp_lower == "pumps":
-    filtered_data = data[data['source'].str.lower().str.contains("pump") & ~data['source'].str.lower().str.contains("phydraulique")]
-else:
-    filtered_data = data
+@st.cache_data
+def load_lagged_correlations(scenario, max_lag):
+    # Raw series of every component in the scenario, paired within each run
+    return lagged_correlations(scenario_files(scenario), max_lag, return_curves=True)
+
+@st.cache_data
+def load_discord_scores(scenario, component, window_size, compact):
+    # Subsequence length follows the window size, so each window's score is
+    # how unlike anything else in its recording the worst pattern inside it is
+    data = select_component(load_data(scenario, component, window_size, compact), component)
+    return window_discord_scores(data, window_size, window_size // 2).to_numpy()
+
+@st.cache_data
+def load_matrix_profile(file_path, m):
+    return recording_matrix_profile(file_path, m)
+
+@st.cache_resource
+def load_window_index(window_size):
+    # Persisted on disk and only re-windowed for recordings that changed
+    return update_index(window_size=window_size, step=window_size // 2)
 
-if filtered_data.empty:
+@st.cache_resource
+def load_pca_detector(scenario, component, window_size):
+    # Fitted in mini-batches on first use and persisted; later sessions only
+    # load the stored components
+    return load_or_fit_detector(scenario, component, window_size, window_size // 2)
+
+@st.cache_data
+def load_unit_index(h5_path, mtime):
+    # mtime is only part of the cache key; the sidecar index itself is
+    # rebuilt by load_cmaps_index when the file changes
+    return load_cmaps_index(h5_path)
+
+# Only the recordings of the selected component are read and windowed;
+# select_component is then a precomputed slice lookup, not a string scan
+data = load_data(scenario, component, window_size, compact)
+filtered_data = select_component(data, component) if data is not None else None
+if filtered_data is None or filtered_data.empty:
     st.warning("No data found for the selected system component.")
     st.stop()
 
+if 'memory_report' in filtered_data.attrs:
+    report = filtered_data.attrs['memory_report']
+    st.sidebar.caption(f"Feature frame: {report['after_bytes'] / 1e6:.2f} MB "
+                       f"({report['saved_pct']:.0f}% smaller than float64)")
+
+query_window = st.sidebar.number_input("Window to compare (row):", min_value=0,
+                                       max_value=len(filtered_data) - 1, value=0, step=1)
+
 # Buttons
 if st.button("Run Predictive Analysis"):
     report, accuracy, feature_names, importances = perform_predictive_analysis(filtered_data)
@@ -79,10 +121,17 @@ if st.button("Show Time Series"):
     raw_file = filtered_data['source'].iloc[0]
     try:
         file_path = os.path.join("analysis", raw_file)
-        raw_df = pd.read_csv(file_path)
-        col = raw_df.select_dtypes(include=[np.number]).columns[0]
+        # Only the plotted column is read (memory-mapped when a binary copy exists)
+        raw_df = read_recording(file_path, columns=[0])
+        col = raw_df.columns[0]
         fig, ax = plt.subplots(figsize=(10, 4))
         ax.plot(raw_df[col])
+        # Change points come from the stored PELT segmentation (computed on
+        # first view if the batch job has not run for this file yet)
+        segments = segment_recording(file_path)
+        if segments:
+            for boundary in segments['breakpoints'][:-1]:
+                ax.axvline(boundary, color='red', linestyle='--', linewidth=0.8)
         ax.set_title(f"Time Series Plot: {col} – {raw_file}")
         st.pyplot(fig)
     except Exception as e:
@@ -100,10 +149,74 @@ if st.button("Show Correlation Matrix"):
     ax.set_yticklabels(corr.columns, fontsize=8)
     st.pyplot(fig)
 
+if st.button("Show Lagged Cross-Correlation"):
+    lag_table, curves = load_lagged_correlations(scenario, int(max_lag))
+    if lag_table.empty:
+        st.warning("No component pairs with overlapping recordings in this scenario.")
+    else:
+        st.subheader("Lead/Lag at Peak Correlation")
+        st.caption("A positive lag means the second signal follows the first by that many samples.")
+        st.dataframe(lag_table)
+        fig, ax = plt.subplots(figsize=(10, 4))
+        for (run, a, b), (lags, corr) in curves.items():
+            ax.plot(lags, corr, label=f"{run}: {a} → {b}")
+        ax.axvline(0, color='grey', linewidth=0.5)
+        ax.set_xlabel("Lag (samples)")
+        ax.set_ylabel("Correlation")
+        ax.set_title(f"Lagged Cross-Correlation – {scenario}")
+        ax.legend(fontsize=7)
+        st.pyplot(fig)
+
+if st.button("Show Matrix Profile"):
+    raw_file = filtered_data['source'].iloc[0]
+    try:
+        file_path = os.path.join("analysis", raw_file)
+        mp = load_matrix_profile(file_path, window_size)
+        raw_df = read_recording(file_path, columns=[0])
+        col = raw_df.columns[0]
+        positions = np.arange(len(mp['profile'])) * mp['factor']
+        fig, (ax_raw, ax_mp) = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+        ax_raw.plot(raw_df[col], linewidth=0.6)
+        for start in mp['discords']:
+            ax_raw.axvspan(start, start + mp['m'], color='red', alpha=0.3)
+        for first, second in mp['motifs']:
+            for start in (first, second):
+                ax_raw.axvspan(start, start + mp['m'], color='green', alpha=0.3)
+        ax_raw.set_title(f"Discords (red) and motifs (green): {col} – {raw_file}")
+        ax_mp.plot(positions, mp['profile'], color='black', linewidth=0.6)
+        ax_mp.set_title(f"Matrix Profile (subsequence length {mp['m']})")
+        st.pyplot(fig)
+    except Exception as e:
+        st.error(f"Error computing matrix profile: {e}")
+
+if st.button("Find Similar Historical Windows"):
+    try:
+        window_index = load_window_index(window_size)
+        selected = filtered_data.iloc[int(query_window)]
+        source = selected['source']
+        window_no = int(query_window) - int(np.flatnonzero(filtered_data['source'].to_numpy() == source)[0])
+        neighbours = query_similar_windows(window_index, component, selected, k=10,
+                                           exclude=(source, window_no))
+        st.subheader(f"Nearest Historical Windows to {source} window {window_no}")
+        st.dataframe(neighbours)
+    except Exception as e:
+        st.error(f"Error querying window index: {e}")
+
 if st.button("Run Anomaly Detection"):
-    X = filtered_data.drop(columns=['label', 'source'])
-    model = IsolationForest(contamination=0.1)
-    preds = model.fit_predict(X)
+    X = filtered_data.drop(columns=META_COLUMNS, errors='ignore')
+    if detector_name == "Incremental PCA":
+        # Scores every window by reconstruction error against stored components
+        detector = load_pca_detector(scenario, component, window_size)
+        if detector is None:
+            st.error("Could not fit the PCA detector for this component.")
+            st.stop()
+        preds = pca_predict(detector, X)
+    else:
+        if use_discord_score:
+            discord = pd.Series(load_discord_scores(scenario, component, window_size, compact), index=X.index)
+            X = X.assign(mp_discord=discord.fillna(discord.median()))
+        model = IsolationForest(contamination=0.1)
+        preds = model.fit_predict(X)
     filtered_data['anomaly'] = preds
 
     normal = filtered_data[filtered_data['anomaly'] == 1]
@@ -115,3 +228,37 @@ if st.button("Run Anomaly Detection"):
     ax.set_title(f"Anomaly Detection - {col}")
     ax.legend()
     st.pyplot(fig)
+
+# CMAPSS unit explorer: single-unit reads through the sidecar unit/cycle index
+st.header("CMAPSS Unit Explorer")
+cmaps_dir = "analysis2"
+h5_files = sorted(f for f in os.listdir(cmaps_dir) if f.endswith('.h5')) if os.path.isdir(cmaps_dir) else []
+if not h5_files:
+    st.info(f"No CMAPSS .h5 files found in {cmaps_dir}/.")
+else:
+    cmaps_file = st.selectbox("CMAPSS file:", h5_files)
+    h5_path = os.path.join(cmaps_dir, cmaps_file)
+    unit_index = load_unit_index(h5_path, os.path.getmtime(h5_path))
+    units = {entry['unit']: entry for entry in unit_index['units']}
+    unit = st.selectbox("Engine unit:", list(units))
+    unit_cycles = [cycle for cycle, _, _ in units[unit]['cycles']]
+    if len(unit_cycles) > 1:
+        first_cycle, last_cycle = st.slider("Cycles:", min(unit_cycles), max(unit_cycles),
+                                            (min(unit_cycles), max(unit_cycles)))
+    else:
+        first_cycle = last_cycle = unit_cycles[0]
+    sensor = st.number_input("Sensor column:", min_value=0, value=0, step=1)
+    if st.button("Show Unit Cycles"):
+        try:
+            unit_df = read_unit(h5_path, unit, (first_cycle, last_cycle), columns=[int(sensor)])
+            fig, ax = plt.subplots(figsize=(10, 4))
+            ax.plot(unit_df.index, unit_df[int(sensor)], linewidth=0.6, label=f"Sensor {int(sensor)}")
+            ax.set_xlabel("Row")
+            ax.set_title(f"{cmaps_file} – unit {unit}, cycles {first_cycle}–{last_cycle}")
+            if 'RUL' in unit_df.columns:
+                ax_rul = ax.twinx()
+                ax_rul.plot(unit_df.index, unit_df['RUL'], color='black', linewidth=0.8)
+                ax_rul.set_ylabel("RUL")
+            st.pyplot(fig)
+        except Exception as e:
+            st.error(f"Error reading unit: {e}")
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from pca_detector import fit_pca_detector, score_array, score_windows
+from utils import load_and_process_file
+
+
+def _recording(path, extra_column, offset, seed):
+    # Hydraulic pump recordings whose second column is named after its first
+    # value, so two files share PumpMotorSpeed but not the second channel
+    rng = np.random.default_rng(seed)
+    t = np.arange(3000)
+    pd.DataFrame({
+        '0': 1500 + 50 * np.sin(t / 40) + rng.standard_normal(len(t)),
+        extra_column: offset + rng.standard_normal(len(t)),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def _files(tmp_path):
+    first = _recording(tmp_path / "Healthy_A_Phydraulique.csv", '87.839', 87.8, 0)
+    second = _recording(tmp_path / "Healthy_B_Phydraulique.csv", '108.74', 108.7, 1)
+    return [(first, 0), (second, 0)]
+
+
+def test_partially_missing_features_use_observed_statistics(tmp_path):
+    files = _files(tmp_path)
+    detector = fit_pca_detector(files, window_size=100, step=50, batch_size=16)
+    first = load_and_process_file(files[0][0], 0)
+    columns = detector['columns']
+    col = columns.index('87.839_mean')
+    assert '108.74_mean' not in first.columns
+
+    # Mean and scale of a feature only the first file has come from that
+    # file's windows alone, not from windows zero-filled in the second
+    observed = first['87.839_mean'].to_numpy()
+    np.testing.assert_allclose(detector['mean'][col], observed.mean())
+    np.testing.assert_allclose(detector['scale'][col], observed.std())
+
+
+def test_missing_features_are_imputed_with_the_fitted_mean(tmp_path):
+    files = _files(tmp_path)
+    detector = fit_pca_detector(files, window_size=100, step=50, batch_size=16)
+    second = load_and_process_file(files[1][0], 0)
+    rows = second.reindex(columns=detector['columns']).to_numpy(dtype=np.float64)
+    assert np.isnan(rows).any()
+
+    filled = np.where(np.isnan(rows), detector['mean'], rows)
+    errors = score_windows(detector, second).to_numpy()
+    np.testing.assert_allclose(errors, score_array(detector, filled))
+    assert np.isfinite(errors).all()
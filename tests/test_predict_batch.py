@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Importing app.py starts the simulator and CSV writer threads, which write
+# into the working directory; each app therefore runs in a subprocess inside
+# a scratch directory holding a copy of its model.
+CLIENT = """
+import json, sys
+import app
+
+client = app.app.test_client()
+results = []
+for body, content_type in json.loads(sys.stdin.read()):
+    response = client.post('/predict/batch', data=body, content_type=content_type)
+    results.append([response.status_code, response.get_data(as_text=True)])
+print('RESULTS' + json.dumps({'features': app.feature_order, 'results': results}))
+"""
+
+
+def _post_batches(app_dir, tmp_path, requests):
+    # Returns the app's feature_order and (status, NDJSON lines) per request
+    shutil.copy(os.path.join(ROOT, app_dir, 'throughput_model.pkl'), tmp_path)
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, app_dir))
+    proc = subprocess.run([sys.executable, '-c', CLIENT], input=json.dumps(requests), cwd=tmp_path, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stderr
+    line = next(line for line in proc.stdout.splitlines() if line.startswith('RESULTS'))
+    output = json.loads(line[len('RESULTS'):])
+    return output['features'], [(status, [json.loads(row) for row in body.splitlines()])
+                                for status, body in output['results']]
+
+
+@pytest.mark.parametrize('app_dir', ['new2', 'new3'])
+def test_array_rows_match_object_rows(app_dir, tmp_path):
+    features, _ = _post_batches(app_dir, tmp_path, [])
+    rows = [[float(i + j) for j in range(len(features))] for i in range(3)]
+    requests = [
+        (json.dumps([dict(zip(features, row)) for row in rows]), 'application/json'),
+        (json.dumps(rows), 'application/json'),
+        ('\n'.join(json.dumps(row) for row in rows), 'application/x-ndjson'),
+        # Array rows one per line without the NDJSON content type
+        ('\n'.join(json.dumps(row) for row in rows), 'application/json'),
+    ]
+    _, results = _post_batches(app_dir, tmp_path, requests)
+    expected = [line['predicted_throughput'] for line in results[0][1]]
+    assert len(expected) == 3
+    for status, lines in results:
+        assert status == 200
+        assert [line['index'] for line in lines] == [0, 1, 2]
+        assert [line['predicted_throughput'] for line in lines] == expected
+
+
+@pytest.mark.parametrize('app_dir', ['new2', 'new3'])
+def test_wrong_length_array_row_gets_its_own_error(app_dir, tmp_path):
+    features, _ = _post_batches(app_dir, tmp_path, [])
+    good = [1.0] * len(features)
+    short = [1.0] * (len(features) - 1)
+    long = [1.0] * (len(features) + 1)
+    _, results = _post_batches(app_dir, tmp_path, [(json.dumps([good, short, long, good]), 'application/json')])
+    status, lines = results[0]
+    assert status == 200
+    assert [line['index'] for line in lines] == [0, 1, 2, 3]
+    assert lines[0]['predicted_throughput'] == lines[3]['predicted_throughput']
+    for line in lines[1:3]:
+        assert 'predicted_throughput' not in line
+        assert f"{len(features)} values" in line['error']
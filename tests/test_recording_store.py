@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+import recording_store
+from recording_store import convert_recording, iter_recording_chunks, read_recording
+
+
+def _converted_recording(tmp_path):
+    csv_path = tmp_path / "Healthy_Test_Driver.csv"
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        '0': rng.standard_normal(1000),
+        '0.1': rng.standard_normal(1000),
+        '0.2': np.arange(1000),
+    }).to_csv(csv_path, index=False)
+    assert convert_recording(str(csv_path)) is not None
+    return str(csv_path)
+
+
+def _capture_memmaps(monkeypatch):
+    # Every open maps the files afresh, so keep the memmaps the reader itself got
+    opened = []
+    original = recording_store.open_recording
+
+    def open_recording(csv_path):
+        mapped = original(csv_path)
+        opened.append(mapped)
+        return mapped
+
+    monkeypatch.setattr(recording_store, "open_recording", open_recording)
+    return opened
+
+
+def test_read_recording_maps_columns_without_copying(tmp_path, monkeypatch):
+    csv_path = _converted_recording(tmp_path)
+    opened = _capture_memmaps(monkeypatch)
+    df = read_recording(csv_path)
+    mapped = opened[-1]
+    assert list(df.columns) == list(mapped)
+    for name, values in mapped.items():
+        assert np.shares_memory(df[name].to_numpy(), values)
+
+
+def test_read_recording_selected_columns_share_memory(tmp_path, monkeypatch):
+    csv_path = _converted_recording(tmp_path)
+    opened = _capture_memmaps(monkeypatch)
+    df = read_recording(csv_path, columns=[0, '0.2'])
+    mapped = opened[-1]
+    assert list(df.columns) == ['0', '0.2']
+    assert np.shares_memory(df['0'].to_numpy(), mapped['0'])
+    assert np.shares_memory(df['0.2'].to_numpy(), mapped['0.2'])
+
+
+def test_recording_chunks_are_views_of_the_memmap(tmp_path, monkeypatch):
+    csv_path = _converted_recording(tmp_path)
+    opened = _capture_memmaps(monkeypatch)
+    chunks = list(iter_recording_chunks(csv_path, 300))
+    mapped = opened[-1]
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    for chunk in chunks:
+        assert np.shares_memory(chunk['0'].to_numpy(), mapped['0'])
+    np.testing.assert_array_equal(pd.concat(chunks, ignore_index=True)['0.1'], mapped['0.1'])
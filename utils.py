@@ -1,113 +1,748 @@
 import os
+import hashlib
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 
-def extract_features(df, window_size=100, step=50):
-    features = []
-    for start in range(0, len(df) - window_size + 1, step):
-        window = df.iloc[start:start + window_size]
-        feat = {}
-        for col in df.columns:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                feat[col + '_mean'] = window[col].mean()
-                feat[col + '_std'] = window[col].std()
-                feat[col + '_min'] = window[col].min()
-                feat[col + '_max'] = window[col].max()
-        features.append(feat)
-    return pd.DataFrame(features)
-
-def load_and_process_file(filepath, label, window_size=100, step=50):
-    try:
-        df = pd.read_csv(filepath)
-    except Exception as e:
-        print(f"Error reading {filepath}: {e}")
+import feature_cache
+from recording_store import read_recording, iter_recording_chunks
+
+def _window_view(values, window_size, step):
+    # Strided (n_windows, n_cols, window_size) view over the rows; no copy.
+    windows = np.lib.stride_tricks.sliding_window_view(values, window_size, axis=0)
+    return windows[::step]
+
+DEFAULT_FEATURES = ('mean', 'std', 'min', 'max')
+EXTENDED_FEATURES = DEFAULT_FEATURES + ('rms', 'ptp', 'skew', 'kurt', 'crest', 'zcr', 'fft_bands')
+FFT_BANDS = 4
+# Bump whenever extraction changes its output, so cached features are rebuilt
+FEATURE_SET_VERSION = 2
+
+def _window_stats(windows, features, has_nan):
+    # Computes every requested statistic over the (n_windows, n_cols, window_size)
+    # window matrix. Intermediate arrays (mean, centred windows, central moments)
+    # are computed once and shared between the statistics that need them.
+    unknown = [name for name in features if name not in EXTENDED_FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown window features: {unknown}")
+
+    stats = {}
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if has_nan:
+            # Moments skip NaN samples, with each window's own sample count as n
+            n = (~np.isnan(windows)).sum(axis=2)
+            mean = np.nanmean(windows, axis=2)
+        else:
+            n = windows.shape[2]
+            mean = windows.mean(axis=2)
+
+        centred = None
+        moments = {}
+
+        def central(power):
+            nonlocal centred
+            if centred is None:
+                centred = windows - mean[..., None]
+            if power not in moments:
+                powered = centred ** power
+                moments[power] = np.nanmean(powered, axis=2) if has_nan else powered.mean(axis=2)
+            return moments[power]
+
+        def rms():
+            if 'rms' not in moments:
+                squares = windows ** 2
+                moments['rms'] = np.sqrt(np.nanmean(squares, axis=2) if has_nan else squares.mean(axis=2))
+            return moments['rms']
+
+        for name in features:
+            if name == 'mean':
+                stats['mean'] = mean
+            elif name == 'std':
+                if has_nan:
+                    stats['std'] = np.nanstd(windows, axis=2, ddof=1)
+                else:
+                    stats['std'] = windows.std(axis=2, ddof=1)
+            elif name == 'min':
+                stats['min'] = np.nanmin(windows, axis=2) if has_nan else windows.min(axis=2)
+            elif name == 'max':
+                stats['max'] = np.nanmax(windows, axis=2) if has_nan else windows.max(axis=2)
+            elif name == 'rms':
+                stats['rms'] = rms()
+            elif name == 'ptp':
+                if has_nan:
+                    stats['ptp'] = np.nanmax(windows, axis=2) - np.nanmin(windows, axis=2)
+                else:
+                    stats['ptp'] = np.ptp(windows, axis=2)
+            elif name == 'skew':
+                # Bias-corrected sample skewness, as pandas' Series.skew
+                # (0 for a constant window, NaN below 3 samples)
+                m2, m3 = central(2), central(3)
+                skew = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+                stats['skew'] = np.where(n < 3, np.nan, np.where(m2 == 0, 0.0, skew))
+            elif name == 'kurt':
+                # Bias-corrected excess kurtosis, as pandas' Series.kurt
+                # (0 for a constant window, NaN below 4 samples)
+                m2, m4 = central(2), central(4)
+                kurt = (n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2 ** 2) \
+                    - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+                stats['kurt'] = np.where(n < 4, np.nan, np.where(m2 == 0, 0.0, kurt))
+            elif name == 'crest':
+                peak = np.nanmax(np.abs(windows), axis=2) if has_nan else np.abs(windows).max(axis=2)
+                stats['crest'] = np.where(rms() == 0, 0.0, peak / rms())
+            elif name == 'zcr':
+                # Rate of crossings of the window mean, so offset signals still register;
+                # only pairs of consecutive non-NaN samples count
+                central(1)
+                signs = np.signbit(centred)
+                crossings = signs[..., 1:] != signs[..., :-1]
+                if has_nan:
+                    valid = ~(np.isnan(centred[..., 1:]) | np.isnan(centred[..., :-1]))
+                    stats['zcr'] = (crossings & valid).sum(axis=2) / valid.sum(axis=2)
+                else:
+                    stats['zcr'] = crossings.mean(axis=2)
+            elif name == 'fft_bands':
+                # Missing samples sit at the window mean, i.e. contribute no power
+                central(1)
+                filled = np.nan_to_num(centred, nan=0.0) if has_nan else centred
+                power = np.abs(np.fft.rfft(filled, axis=2)) ** 2 / windows.shape[2]
+                bands = np.array_split(np.arange(1, power.shape[2]), FFT_BANDS)
+                for b, bins in enumerate(bands):
+                    band = power[..., bins].sum(axis=2)
+                    stats[f'band{b}'] = np.where(n == 0, np.nan, band) if has_nan else band
+    return stats
+
+def extract_features(df, window_size=100, step=50, features=None):
+    features = tuple(features) if features else DEFAULT_FEATURES
+    numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    n_windows = (len(df) - window_size) // step + 1 if len(df) >= window_size else 0
+    if not numeric_cols or n_windows <= 0:
+        return pd.DataFrame()
+
+    values = df[numeric_cols].to_numpy(dtype=np.float64)
+    windows = _window_view(values, window_size, step)
+    stats = _window_stats(windows, features, np.isnan(values).any())
+
+    result = {}
+    for i, col in enumerate(numeric_cols):
+        int_col = pd.api.types.is_integer_dtype(df[col])
+        for name, stat in stats.items():
+            column = stat[:, i]
+            if int_col and name in ('min', 'max'):
+                column = column.astype(df[col].dtype)
+            result[col + '_' + name] = column
+    return pd.DataFrame(result)
+
+# Statistics that can be derived exactly from per-block sufficient statistics
+PYRAMID_FEATURES = ('mean', 'std', 'min', 'max', 'rms', 'ptp')
+PYRAMID_BASE = 25
+
+def build_window_pyramid(df, base=PYRAMID_BASE):
+    # Reduces every numeric column to per-block count/mean/M2/min/max over
+    # consecutive blocks of `base` rows. Blocks are merged with Chan's parallel
+    # variance update, which stays exact where sum-of-squares would cancel.
+    numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    n_blocks = len(df) // base
+    if not numeric_cols or n_blocks == 0:
         return None
 
-    lower_filepath = filepath.lower()
+    values = df[numeric_cols].to_numpy(dtype=np.float64)[:n_blocks * base]
+    blocks = values.reshape(n_blocks, base, len(numeric_cols))
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        count = (~np.isnan(blocks)).sum(axis=1)
+        mean = np.nanmean(blocks, axis=1)
+        m2 = np.nansum((blocks - mean[:, None, :]) ** 2, axis=1)
+        vmin = np.nanmin(blocks, axis=1)
+        vmax = np.nanmax(blocks, axis=1)
+
+    pyramid = {}
+    for i, col in enumerate(numeric_cols):
+        int_col = pd.api.types.is_integer_dtype(df[col])
+        pyramid[(col, 'count')] = count[:, i]
+        pyramid[(col, 'mean')] = mean[:, i]
+        pyramid[(col, 'm2')] = m2[:, i]
+        pyramid[(col, 'min')] = vmin[:, i].astype(df[col].dtype) if int_col else vmin[:, i]
+        pyramid[(col, 'max')] = vmax[:, i].astype(df[col].dtype) if int_col else vmax[:, i]
+    pyramid = pd.DataFrame(pyramid)
+    pyramid.attrs['base'] = base
+    return pyramid
+
+def pyramid_features(pyramid, window_size=100, step=50, features=None):
+    # Derives window features for any window_size/step that are multiples of
+    # the pyramid's block size, without touching the raw samples again.
+    features = tuple(features) if features else DEFAULT_FEATURES
+    base = pyramid.attrs['base']
+    if window_size % base or step % base:
+        raise ValueError(f"window_size and step must be multiples of the pyramid base ({base})")
+    unsupported = [name for name in features if name not in PYRAMID_FEATURES]
+    if unsupported:
+        raise ValueError(f"Features {unsupported} cannot be derived from a window pyramid")
+
+    k, m = window_size // base, step // base
+    n_windows = (len(pyramid) - k) // m + 1 if len(pyramid) >= k else 0
+    if n_windows <= 0:
+        return pd.DataFrame()
+
+    def merged(col, stat):
+        return _window_view(pyramid[(col, stat)].to_numpy(), k, m)
+
+    result = {}
+    with np.errstate(all='ignore'):
+        for col in pyramid.columns.get_level_values(0).unique():
+            count = merged(col, 'count')
+            block_mean = merged(col, 'mean')
+            n = count.sum(axis=1)
+            weighted = np.where(count > 0, count * block_mean, 0.0)
+            mean = weighted.sum(axis=1) / n
+            spread = np.where(count > 0, count * (block_mean - mean[:, None]) ** 2, 0.0)
+            m2 = merged(col, 'm2').sum(axis=1) + spread.sum(axis=1)
+            vmin = merged(col, 'min')
+            vmax = merged(col, 'max')
+            stats = {
+                'mean': lambda: mean,
+                'std': lambda: np.sqrt(m2 / (n - 1)),
+                'min': lambda: np.nanmin(vmin, axis=1) if vmin.dtype.kind == 'f' else vmin.min(axis=1),
+                'max': lambda: np.nanmax(vmax, axis=1) if vmax.dtype.kind == 'f' else vmax.max(axis=1),
+                'rms': lambda: np.sqrt(m2 / n + mean ** 2),
+                'ptp': lambda: np.nanmax(vmax, axis=1).astype(np.float64) - np.nanmin(vmin, axis=1),
+            }
+            for name in features:
+                result[col + '_' + name] = stats[name]()
+    return pd.DataFrame(result)
+
+COMPONENTS = ("Hydraulic Pump", "Tanks", "Engines", "Pumps")
+# Per-window bookkeeping columns that are never model inputs
+META_COLUMNS = ['label', 'source', 'component']
+
+def file_component(filepath):
+    name = os.path.basename(filepath).lower()
+    if "driver" in name:
+        return "Engines"
+    elif "phydraulique" in name:
+        return "Hydraulic Pump"
+    elif "pump" in name:
+        return "Pumps"
+    elif "tank" in name:
+        return "Tanks"
+    return None
+
+def _component_features(filepath, features):
+    # `features` is either one feature list for every file or a mapping of
+    # component name -> feature list; unlisted components get the defaults.
+    if isinstance(features, dict):
+        return features.get(file_component(filepath)) or DEFAULT_FEATURES
+    return features
+
+def _rename_map(filepath, df):
+    component = file_component(filepath)
     rename_map = {}
-    if "driver" in lower_filepath:
+    if component == "Engines":
         rename_map = {'0': 'DriverPower'}
-    elif "phydraulique" in lower_filepath:
+    elif component == "Hydraulic Pump":
         rename_map = {'0': 'PumpMotorSpeed'}
-    elif "pump" in lower_filepath and "phydraulique" not in lower_filepath:
+    elif component == "Pumps":
         rename_map = {'0': 'PumpFlow'}
-    elif "tank" in lower_filepath:
+    elif component == "Tanks":
         numeric_cols = df.select_dtypes(include=[np.number]).columns
         if len(numeric_cols) >= 2:
             rename_map = {'0': 'TankVolume', '1': 'TankTemperature'}
         else:
             rename_map = {'0': 'TankMeasurement'}
+    return rename_map
+
+def _iter_numeric_chunks(filepath, chunksize):
+    rename_map = None
+    numeric_cols = None
+    for chunk in iter_recording_chunks(filepath, chunksize):
+        if rename_map is None:
+            rename_map = _rename_map(filepath, chunk)
+            chunk.rename(columns=rename_map, inplace=True)
+            numeric_cols = chunk.select_dtypes(include=[np.number]).columns
+            if numeric_cols.empty:
+                return
+        else:
+            chunk.rename(columns=rename_map, inplace=True)
+        yield chunk[numeric_cols]
+
+def _iter_window_blocks(chunks, window_size, step):
+    # Yields row blocks holding only complete windows. The rows after the last
+    # complete window of a block are carried into the next one, so windowing
+    # the blocks gives exactly the windows of the whole concatenated stream.
+    carry = None
+    for numeric_df in chunks:
+        if carry is not None and not carry.empty:
+            numeric_df = pd.concat([carry, numeric_df], ignore_index=True)
+        n_windows = (len(numeric_df) - window_size) // step + 1 if len(numeric_df) >= window_size else 0
+        if n_windows > 0:
+            yield numeric_df
+        carry = numeric_df.iloc[n_windows * step:].reset_index(drop=True)
+
+def iter_file_features(filepath, label, window_size=100, step=50, chunksize=100000, features=None):
+    # Reads the recording in chunks and yields one feature frame per chunk,
+    # identical to the in-memory path once concatenated. A read error part way
+    # through is raised to the caller; the frames already yielded are partial.
+    features = _component_features(filepath, features)
+    for block in _iter_window_blocks(_iter_numeric_chunks(filepath, chunksize), window_size, step):
+        feature_df = extract_features(block, window_size, step, features)
+        feature_df['label'] = label
+        feature_df['source'] = os.path.basename(filepath)
+        yield feature_df
+
+def run_name(filepath):
+    # Fault_Type2_Driver.csv -> Fault_Type2: the run a component recording belongs to
+    return os.path.splitext(os.path.basename(filepath))[0].rsplit('_', 1)[0]
+
+def _joint_chunks(files, chunksize):
+    # Steps the recordings of one run in lockstep, aligned on sample index and
+    # truncated to the shortest. Unnamed channels ('0.1', '0.2', ...) clash
+    # between recordings, so they get the file's component suffix.
+    named = ('DriverPower', 'PumpMotorSpeed', 'PumpFlow', 'TankVolume', 'TankTemperature', 'TankMeasurement')
+    streams = [_iter_numeric_chunks(file, chunksize) for file in files]
+    suffixes = [os.path.splitext(os.path.basename(file))[0].rsplit('_', 1)[-1] for file in files]
+    renames = None
+    while True:
+        parts = []
+        for stream in streams:
+            chunk = next(stream, None)
+            if chunk is None:
+                return
+            parts.append(chunk)
+        if renames is None:
+            renames = [{col: f"{suffix}_{col}" for col in part.columns if col not in named}
+                       for part, suffix in zip(parts, suffixes)]
+        n = min(len(part) for part in parts)
+        yield [part.iloc[:n].rename(columns=rename).reset_index(drop=True)
+               for part, rename in zip(parts, renames)]
+        if any(len(part) > n for part in parts):
+            return
+
+def iter_joint_features(files, label, window_size=100, step=50, chunksize=100000, features=None):
+    # Wide windows across every component recording of one run: each window
+    # holds the features of all channels sampled over the same rows.
+    groups = []
+
+    def wide_chunks():
+        for parts in _joint_chunks(files, chunksize):
+            if not groups:
+                groups.extend((list(part.columns), _component_features(file, features))
+                              for part, file in zip(parts, files))
+            yield pd.concat(parts, axis=1)
+
+    for block in _iter_window_blocks(wide_chunks(), window_size, step):
+        feature_df = pd.concat([extract_features(block[cols], window_size, step, feats)
+                                for cols, feats in groups], axis=1)
+        feature_df['label'] = label
+        feature_df['source'] = run_name(files[0])
+        yield feature_df
+
+def load_joint_scenario_data(files, window_size=100, step=50, chunksize=100000, features=None, compact=False):
+    # Groups the (file, label) list into runs and windows each run jointly.
+    runs = {}
+    for file, label in files:
+        if os.path.exists(file):
+            runs.setdefault((run_name(file), label), []).append(file)
+        else:
+            print(f"File {file} not found.")
+
+    data_list = []
+    for (run, label), run_files in runs.items():
+        # Collected per run first, so a run that fails part way contributes
+        # nothing rather than the windows read before the error
+        try:
+            frames = list(iter_joint_features(run_files, label, window_size, step, chunksize, features))
+        except Exception as e:
+            print(f"Error processing run {run}: {e}")
+            continue
+        data_list.extend(frames)
+    if not data_list:
+        return None
+    data = pd.concat(data_list, ignore_index=True)
+    return compact_feature_frame(data) if compact else data
+
+def _read_numeric(filepath):
+    try:
+        df = read_recording(filepath)
+    except Exception as e:
+        print(f"Error reading {filepath}: {e}")
+        return None
 
+    rename_map = _rename_map(filepath, df)
     if rename_map:
         df.rename(columns=rename_map, inplace=True)
 
     numeric_df = df.select_dtypes(include=[np.number])
     if numeric_df.empty:
         return None
+    return numeric_df
+
+# Window statistics the lazy polars plan can express as group aggregations
+POLARS_FEATURES = ('mean', 'std', 'min', 'max', 'rms', 'ptp')
+
+def _polars_file_features(filepath, window_size, step, features):
+    # One lazy plan: scan -> rename -> numeric projection -> overlapping window
+    # aggregation. Only the final feature table is materialised. Raises
+    # ImportError when polars is not installed, so callers can fall back.
+    import polars as pl
+    import polars.selectors as cs
+
+    # pandas-style header names (duplicates become '0.1', '0.2', ...) and the
+    # rename map come from a small sample so both engines name columns alike
+    sample = pd.read_csv(filepath, nrows=1000)
+    rename_map = {k: v for k, v in _rename_map(filepath, sample).items() if k in sample.columns}
+    plan = (
+        pl.scan_csv(filepath, has_header=False, skip_rows=1, new_columns=list(sample.columns),
+                    infer_schema_length=None)
+        .rename(rename_map)
+        .select(cs.numeric())
+    )
+    numeric_cols = plan.collect_schema().names()
+    if not numeric_cols:
+        return None
+
+    exprs = {
+        'mean': lambda c: pl.col(c).mean(),
+        'std': lambda c: pl.col(c).std(ddof=1),
+        'min': lambda c: pl.col(c).min(),
+        'max': lambda c: pl.col(c).max(),
+        'rms': lambda c: (pl.col(c).cast(pl.Float64) ** 2).mean().sqrt(),
+        'ptp': lambda c: pl.col(c).max().cast(pl.Float64) - pl.col(c).min().cast(pl.Float64),
+    }
+    aggs = [exprs[name](col).alias(f"{col}_{name}") for col in numeric_cols for name in features]
+    result = (
+        plan.with_row_index("_row")
+        .with_columns(pl.col("_row").cast(pl.Int64))
+        .group_by_dynamic("_row", every=f"{step}i", period=f"{window_size}i", closed="left", start_by="window")
+        .agg(aggs + [pl.len().alias("_n")])
+        .filter((pl.col("_n") == window_size) & (pl.col("_row") >= 0))
+        .sort("_row")
+        .drop("_row", "_n")
+        .collect()
+    )
+    # Built column by column from NumPy, so pyarrow is not needed
+    return pd.DataFrame({col: result[col].to_numpy() for col in result.columns})
+
+def _polars_available():
+    try:
+        import polars  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
-    feature_df = extract_features(numeric_df, window_size, step)
+def load_and_process_file(filepath, label, window_size=100, step=50, chunksize=None, features=None,
+                          engine="pandas"):
+    # engine="polars" runs the lazy polars plan when polars is installed and
+    # the feature set is one it can express; otherwise pandas is used.
+    if chunksize:
+        # A stream that fails part way is treated like a failed in-memory read,
+        # never returned (or cached) as a truncated frame
+        try:
+            frames = list(iter_file_features(filepath, label, window_size, step, chunksize, features))
+        except Exception as e:
+            print(f"Error reading {filepath}: {e}")
+            return None
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    file_features = _component_features(filepath, features) or DEFAULT_FEATURES
+    if engine == "polars" and set(file_features) <= set(POLARS_FEATURES) and _polars_available():
+        try:
+            feature_df = _polars_file_features(filepath, window_size, step, file_features)
+        except Exception as e:
+            print(f"Error reading {filepath}: {e}")
+            return None
+    else:
+        numeric_df = _read_numeric(filepath)
+        if numeric_df is None:
+            return None
+        feature_df = extract_features(numeric_df, window_size, step, file_features)
+
+    if feature_df is None:
+        return None
     feature_df['label'] = label
     feature_df['source'] = os.path.basename(filepath)
     return feature_df
 
-def load_scenario_data(files, window_size=100, step=50):
-    data_list = []
+def _load_pyramid(file, base, cache):
+    if cache:
+        key = feature_cache.cache_key(file, 'pyramid', base, FEATURE_SET_VERSION, file_component(file))
+        pyramid = feature_cache.get(key)
+        if pyramid is not None:
+            return pyramid
+    numeric_df = _read_numeric(file)
+    if numeric_df is None:
+        return None
+    pyramid = build_window_pyramid(numeric_df, base)
+    if cache and pyramid is not None:
+        feature_cache.put(key, pyramid)
+    return pyramid
+
+def _load_file_features(file, label, window_size, step, chunksize, features, cache=False, base_block=None,
+                        engine="pandas"):
+    try:
+        file_features = tuple(_component_features(file, features) or DEFAULT_FEATURES)
+        if (base_block and window_size % base_block == 0 and step % base_block == 0
+                and set(file_features) <= set(PYRAMID_FEATURES)):
+            pyramid = _load_pyramid(file, base_block, cache)
+            if pyramid is None:
+                return None
+            df = pyramid_features(pyramid, window_size, step, file_features)
+            df['label'] = label
+            df['source'] = os.path.basename(file)
+            return df
+
+        if cache:
+            # The component decides the output column names (see _rename_map),
+            # so identical bytes under a Driver and a Tank name are cached apart
+            key = feature_cache.cache_key(file, window_size, step, FEATURE_SET_VERSION, file_features,
+                                          file_component(file))
+            df = feature_cache.get(key)
+            if df is not None:
+                # Label and source are not part of the key; the same recording
+                # may be listed under different labels or paths
+                df['label'] = label
+                df['source'] = os.path.basename(file)
+                return df
+        df = load_and_process_file(file, label, window_size, step, chunksize, features, engine)
+        if cache and df is not None:
+            feature_cache.put(key, df)
+        return df
+    except Exception as e:
+        print(f"Error processing {file}: {e}")
+        return None
+
+def compact_feature_frame(data):
+    # float64 features -> float32, label -> int8 and the per-window metadata
+    # strings -> categoricals, which store each distinct file name once.
+    compact = {}
+    for col in data.columns:
+        series = data[col]
+        if col == 'label':
+            compact[col] = series.astype(np.int8)
+        elif col in ('source', 'component'):
+            compact[col] = series.astype('category')
+        elif pd.api.types.is_float_dtype(series):
+            compact[col] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series):
+            compact[col] = pd.to_numeric(series, downcast='integer')
+        else:
+            compact[col] = series
+    return pd.DataFrame(compact, index=data.index)
+
+def frame_memory_report(before, after):
+    before_bytes = int(before.memory_usage(deep=True).sum())
+    after_bytes = int(after.memory_usage(deep=True).sum())
+    return {
+        'before_bytes': before_bytes,
+        'after_bytes': after_bytes,
+        'saved_bytes': before_bytes - after_bytes,
+        'saved_pct': 100.0 * (before_bytes - after_bytes) / before_bytes if before_bytes else 0.0,
+    }
+
+def load_scenario_data(files, window_size=100, step=50, chunksize=None, features=None, workers=None,
+                       cache=False, base_block=None, compact=False, engine="pandas"):
+    # With workers > 1 the files are windowed in a process pool. Results are
+    # concatenated in the order of `files` whatever order they finish in, and
+    # a failing file is reported and skipped instead of aborting the scenario.
+    existing = []
     for file, label in files:
         if os.path.exists(file):
-            df = load_and_process_file(file, label, window_size, step)
-            if df is not None:
-                data_list.append(df)
+            existing.append((file, label))
         else:
             print(f"File {file} not found.")
-    if data_list:
-        return pd.concat(data_list, ignore_index=True)
+
+    if workers and workers > 1 and len(existing) > 1:
+        results = [None] * len(existing)
+        with ProcessPoolExecutor(max_workers=min(workers, len(existing))) as pool:
+            futures = {
+                pool.submit(_load_file_features, file, label, window_size, step, chunksize, features, cache,
+                            base_block, engine): i
+                for i, (file, label) in enumerate(existing)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"Error processing {existing[i][0]}: {e}")
+    else:
+        results = [_load_file_features(file, label, window_size, step, chunksize, features, cache, base_block,
+                                       engine)
+                   for file, label in existing]
+
+    loaded = [(file, df) for (file, _), df in zip(existing, results) if df is not None]
+    if not loaded:
+        return None
+    data = pd.concat([df for _, df in loaded], ignore_index=True)
+    data['component'] = pd.Categorical(
+        np.repeat([file_component(file) for file, _ in loaded], [len(df) for _, df in loaded]),
+        categories=COMPONENTS
+    )
+    if compact:
+        compacted = compact_feature_frame(data)
+        report = frame_memory_report(data, compacted)
+        print(f"Compact layout: {report['before_bytes'] / 1e6:.2f} MB -> {report['after_bytes'] / 1e6:.2f} MB "
+              f"({report['saved_pct']:.0f}% saved)")
+        compacted.attrs['memory_report'] = report
+        data = compacted
+    build_component_index(data)
+    return data
+
+def _row_runs(positions):
+    # Compresses sorted row positions into (start, stop) ranges
+    if len(positions) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+    starts = positions[np.r_[0, breaks]]
+    stops = positions[np.r_[breaks - 1, len(positions) - 1]] + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+def _component_codes(data):
+    # Per-row component code (position in COMPONENTS, -1 for unknown) as int8.
+    # The scenario loaders add a categorical `component` column, which makes
+    # this an integer compare. Frames without one (hand-built frames, the
+    # Tkinter dummy data) fall back to factorizing the `source` strings on
+    # every call, a full string scan; add the column to avoid that slow path.
+    if 'component' in data.columns:
+        return pd.Categorical(data['component'], categories=COMPONENTS).codes.astype(np.int8, copy=False)
+    sources = pd.Categorical(data['source'])
+    source_components = np.array(
+        [COMPONENTS.index(c) if c in COMPONENTS else -1
+         for c in (file_component(src) for src in sources.categories)] + [-1],
+        dtype=np.int8
+    )
+    return source_components[sources.codes]
+
+def _codes_fingerprint(codes):
+    return hashlib.blake2b(np.ascontiguousarray(codes).tobytes(), digest_size=16).hexdigest()
+
+def build_component_index(data, codes=None):
+    # Maps each component to the row ranges it occupies and keeps the map in
+    # data.attrs, so component selections are slice lookups rather than string
+    # scans over `source`. The map is stored with a fingerprint of the per-row
+    # component codes it was built from.
+    codes = _component_codes(data) if codes is None else codes
+    index = {comp: _row_runs(np.flatnonzero(codes == i)) for i, comp in enumerate(COMPONENTS)}
+    data.attrs['component_index'] = {'rows': len(data), 'fingerprint': _codes_fingerprint(codes), 'ranges': index}
+    return index
+
+def _component_index(data):
+    # attrs survive sample(), sort_values() and reset_index(), so the cached
+    # ranges are only reused when the rows' component codes still match the
+    # ones they were built from; any reorder or filter rebuilds them.
+    cached = data.attrs.get('component_index')
+    codes = _component_codes(data)
+    if (cached and cached['rows'] == len(data)
+            and cached.get('fingerprint') == _codes_fingerprint(codes)):
+        return cached['ranges']
+    return build_component_index(data, codes)
+
+def select_component(data, component):
+    lookup = {c.lower(): c for c in COMPONENTS}
+    component = lookup.get(str(component).lower()) if component is not None else None
+    if component is None:
+        return data
+    ranges = _component_index(data)[component]
+    if len(ranges) == 1:
+        selected = data.iloc[ranges[0][0]:ranges[0][1]]
     else:
+        positions = np.concatenate([np.arange(start, stop) for start, stop in ranges]) if ranges else []
+        selected = data.iloc[positions]
+    selected.attrs = {k: v for k, v in data.attrs.items() if k != 'component_index'}
+    return selected
+
+DATA_DIR = "analysis"
+
+# Scenario -> component -> (recording, label). Loaders resolve file names
+# against DATA_DIR and only touch the recordings of the components asked for.
+SCENARIO_MANIFEST = {
+    "Scenario 1": {
+        "Engines": [
+            ("Healthy_Scenario_Driver.csv", 0),
+            ("Healthy_Scenario1_Driver.csv", 0),
+            ("Fault_Type2_Driver.csv", 1),
+        ],
+        "Tanks": [
+            ("Healthy_Scenario_Tank.csv", 0),
+            ("Healthy_Scenario1_Tank.csv", 0),
+            ("Fault_Type2_Tank.csv", 1),
+        ],
+        "Hydraulic Pump": [
+            ("Healthy_Scenario1_Phydraulique.csv", 0),
+            ("Fault_Type2_Phydraulique.csv", 1),
+        ],
+    },
+    "Scenario 2": {
+        "Engines": [
+            ("Healthy_Scenario2_Driver.csv", 0),
+            ("Fault_Type3_Driver.csv", 1),
+        ],
+        "Hydraulic Pump": [
+            ("Healthy_Scenario2_Phydraulique.csv", 0),
+            ("Fault_Type3_Phydraulique.csv", 1),
+        ],
+        "Pumps": [
+            ("Healthy_Scenario2_Pump.csv", 0),
+            ("Fault_Type3_Pump.csv", 1),
+        ],
+        "Tanks": [
+            ("Healthy_Scenario2_Tank.csv", 0),
+            ("Fault_Type3_Tank.csv", 1),
+        ],
+    },
+    "Scenario 3": {
+        "Engines": [
+            ("Healthy_Scenario3_Driver.csv", 0),
+            ("Fault_Type3+4_Driver.csv", 1),
+        ],
+        "Hydraulic Pump": [
+            ("Healthy_Scenario3_Phydraulique.csv", 0),
+            ("Fault_Type3+4_Phydraulique.csv", 1),
+        ],
+        "Pumps": [
+            ("Healthy_Scenario3_Pump.csv", 0),
+        ],
+        "Tanks": [
+            ("Healthy_Scenario3_Tank.csv", 0),
+            ("Fault_Type3+4_Tank.csv", 1),
+        ],
+    },
+}
+
+def scenario_files(scenario, component=None, data_dir=DATA_DIR):
+    components = SCENARIO_MANIFEST[scenario]
+    selected = components if component is None else {component: components.get(component, [])}
+    return [(os.path.join(data_dir, fname), label)
+            for entries in selected.values()
+            for fname, label in entries]
+
+def load_scenario(scenario, component=None, window_size=100, step=50, workers=None, cache=True,
+                  compact=False, data_dir=DATA_DIR, joint=False):
+    files = scenario_files(scenario, component, data_dir)
+    if not files:
         return None
+    if joint:
+        return load_joint_scenario_data(files, window_size, step, compact=compact)
+    return load_scenario_data(files, window_size, step, workers=workers, cache=cache, base_block=PYRAMID_BASE,
+                              compact=compact)
+
+def load_scenario1_data(window_size=100, step=50, workers=None, cache=True, compact=False):
+    return load_scenario("Scenario 1", None, window_size, step, workers, cache, compact)
+
+def load_scenario2_data(window_size=100, step=50, workers=None, cache=True, compact=False):
+    return load_scenario("Scenario 2", None, window_size, step, workers, cache, compact)
 
-def load_scenario1_data():
-    files = [
-        ("analysis/Healthy_Scenario_Driver.csv", 0),
-        ("analysis/Healthy_Scenario_Tank.csv", 0),
-        ("analysis/Healthy_Scenario1_Driver.csv", 0),
-        ("analysis/Healthy_Scenario1_Tank.csv", 0),
-        ("analysis/Healthy_Scenario1_Phydraulique.csv", 0),
-        ("analysis/Fault_Type2_Driver.csv", 1),
-        ("analysis/Fault_Type2_Tank.csv", 1),
-        ("analysis/Fault_Type2_Phydraulique.csv", 1)
-    ]
-    return load_scenario_data(files)
-
-def load_scenario2_data():
-    files = [
-        ("analysis/Healthy_Scenario2_Driver.csv", 0),
-        ("analysis/Healthy_Scenario2_Phydraulique.csv", 0),
-        ("analysis/Healthy_Scenario2_Pump.csv", 0),
-        ("analysis/Healthy_Scenario2_Tank.csv", 0),
-        ("analysis/Fault_Type3_Driver.csv", 1),
-        ("analysis/Fault_Type3_Phydraulique.csv", 1),
-        ("analysis/Fault_Type3_Pump.csv", 1),
-        ("analysis/Fault_Type3_Tank.csv", 1)
-    ]
-    return load_scenario_data(files)
-
-def load_scenario3_data():
-    files = [
-        ("analysis/Healthy_Scenario3_Driver.csv", 0),
-        ("analysis/Healthy_Scenario3_Phydraulique.csv", 0),
-        ("analysis/Healthy_Scenario3_Pump.csv", 0),
-        ("analysis/Healthy_Scenario3_Tank.csv", 0),
-        ("analysis/Fault_Type3+4_Driver.csv", 1),
-        ("analysis/Fault_Type3+4_Phydraulique.csv", 1),
-        ("analysis/Fault_Type3+4_Tank.csv", 1)
-    ]
-    return load_scenario_data(files)
+def load_scenario3_data(window_size=100, step=50, workers=None, cache=True, compact=False):
+    return load_scenario("Scenario 3", None, window_size, step, workers, cache, compact)
 
 def perform_predictive_analysis(data):
     from sklearn.ensemble import RandomForestClassifier
     from sklearn.model_selection import train_test_split
     from sklearn.metrics import classification_report, accuracy_score
 
-    X = data.drop(columns=['label', 'source'])
+    X = data.drop(columns=META_COLUMNS, errors='ignore')
     y = data['label']
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
     clf = RandomForestClassifier(n_estimators=100, random_state=42)
@@ -0,0 +1,168 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.neighbors import BallTree
+
+import feature_cache
+from utils import (
+    META_COLUMNS,
+    PYRAMID_BASE,
+    SCENARIO_MANIFEST,
+    _load_file_features,
+    file_component,
+    scenario_files
+)
+
+# One ball tree per component over its standardised window features, stored
+# with the per-source bookkeeping needed to update it when recordings change.
+INDEX_VERSION = 1
+
+def index_path(window_size=100, step=50, cache_dir=None):
+    return os.path.join(cache_dir or feature_cache.CACHE_DIR, f"window_index_w{window_size}_s{step}.joblib")
+
+def manifest_files(scenarios=None, data_dir="analysis"):
+    # Every labelled recording the scenario loaders know about, once each
+    files = {}
+    for scenario in scenarios or SCENARIO_MANIFEST:
+        for file, label in scenario_files(scenario, data_dir=data_dir):
+            files.setdefault(file, label)
+    return list(files.items())
+
+def _empty_index(window_size, step):
+    return {'version': INDEX_VERSION, 'window_size': window_size, 'step': step, 'sources': {}, 'components': {}}
+
+def load_index(window_size=100, step=50, path=None):
+    path = path or index_path(window_size, step)
+    try:
+        index = joblib.load(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Discarding unreadable window index {path}: {e}")
+        return None
+    if index.get('version') != INDEX_VERSION:
+        return None
+    return index
+
+def save_index(index, path=None):
+    path = path or index_path(index['window_size'], index['step'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    feature_cache.atomic_write(path, lambda tmp_path: joblib.dump(index, tmp_path))
+
+def _build_component(sources):
+    # sources: [(source entry, feature frame)] for one component. Columns
+    # follow the first source; a column another recording lacks is filled
+    # with the column mean, i.e. 0 once standardised.
+    columns = [col for col in sources[0][1].columns if col not in META_COLUMNS]
+    features = np.vstack([df.reindex(columns=columns).to_numpy(dtype=np.float64) for _, df in sources])
+    mean = np.nanmean(features, axis=0)
+    scale = np.nanstd(features, axis=0)
+    scale[~np.isfinite(scale) | (scale == 0)] = 1.0
+    mean[~np.isfinite(mean)] = 0.0
+    standardised = np.nan_to_num((features - mean) / scale)
+    meta = pd.DataFrame({
+        'source': np.concatenate([[entry['source']] * len(df) for entry, df in sources]),
+        'label': np.concatenate([[entry['label']] * len(df) for entry, df in sources]).astype(np.int8),
+        'window': np.concatenate([np.arange(len(df)) for _, df in sources]),
+    })
+    return {
+        'columns': columns,
+        'mean': mean,
+        'scale': scale,
+        'tree': BallTree(standardised),
+        'features': features,
+        'meta': meta,
+    }
+
+def update_index(files=None, window_size=100, step=50, path=None, rebuild=False):
+    # Brings the stored index in line with `files` ((path, label) pairs,
+    # default: every manifest recording). Only new or changed recordings are
+    # windowed, and only the components they belong to get a new tree.
+    files = files if files is not None else manifest_files()
+    path = path or index_path(window_size, step)
+    index = None if rebuild else load_index(window_size, step, path)
+    index = index or _empty_index(window_size, step)
+
+    wanted = {}
+    for file, label in files:
+        if os.path.exists(file):
+            wanted[file] = {'source': os.path.basename(file), 'label': label,
+                            'digest': feature_cache.file_digest(file), 'component': file_component(file)}
+        else:
+            print(f"File {file} not found.")
+
+    changed = {entry['component'] for file, entry in index['sources'].items()
+               if file not in wanted or wanted[file]['digest'] != entry['digest']
+               or wanted[file]['label'] != entry['label']}
+    changed |= {entry['component'] for file, entry in wanted.items() if file not in index['sources']}
+    changed.discard(None)
+    if not changed and index['sources']:
+        return index
+
+    for component in changed:
+        sources = []
+        for file, entry in wanted.items():
+            if entry['component'] != component:
+                continue
+            df = _load_file_features(file, entry['label'], window_size, step, None, None, cache=True,
+                                     base_block=PYRAMID_BASE)
+            if df is not None and not df.empty:
+                sources.append((entry, df))
+        if sources:
+            index['components'][component] = _build_component(sources)
+        else:
+            index['components'].pop(component, None)
+    index['sources'] = wanted
+    save_index(index, path)
+    print(f"Window index updated for {sorted(changed)} -> {path}")
+    return index
+
+def query(index, component, window, k=5, exclude=None):
+    # `window` is a feature row (Series, dict or one-row frame) as produced by
+    # the scenario loaders. Returns the k nearest historical windows; pass
+    # exclude=(source, window) to leave out the queried window itself.
+    entry = index['components'].get(component)
+    if entry is None:
+        raise KeyError(f"No indexed windows for component {component!r}")
+    if isinstance(window, pd.DataFrame):
+        window = window.iloc[0]
+    row = pd.Series(window, dtype='object').reindex(entry['columns']).astype(np.float64).to_numpy()
+    row = np.where(np.isnan(row), entry['mean'], row)
+    extra = 1 if exclude is not None else 0
+    distances, positions = entry['tree'].query(((row - entry['mean']) / entry['scale'])[None, :],
+                                               k=min(k + extra, len(entry['meta'])))
+    result = entry['meta'].iloc[positions[0]].reset_index(drop=True)
+    result['start_sample'] = result['window'] * index['step']
+    result['distance'] = distances[0]
+    if exclude is not None:
+        source, window_no = exclude
+        result = result[~((result['source'] == source) & (result['window'] == window_no))]
+    return result.head(k).reset_index(drop=True)
+
+def window_features(index, component, source, window):
+    # Raw (unstandardised) features of an indexed window
+    entry = index['components'][component]
+    meta = entry['meta']
+    rows = np.flatnonzero((meta['source'] == source).to_numpy() & (meta['window'] == window).to_numpy())
+    if not len(rows):
+        return None
+    return pd.Series(entry['features'][rows[0]], index=entry['columns'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the nearest-neighbour window index.")
+    parser.add_argument("--window-size", type=int, default=100)
+    parser.add_argument("--step", type=int, default=50)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIO_MANIFEST))
+    parser.add_argument("--rebuild", action="store_true", help="ignore the stored index")
+    args = parser.parse_args(argv)
+
+    index = update_index(manifest_files(args.scenario), args.window_size, args.step, rebuild=args.rebuild)
+    for component, entry in sorted(index['components'].items()):
+        print(f"{component}: {len(entry['meta'])} windows, {len(entry['columns'])} features")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())